@@ -1,10 +1,13 @@
 import streamlit as st
+from utils.llm_cache import setup_llm_cache
 
 st.set_page_config(
     page_title="FullstackGPT Home",
     page_icon="🤖",
 )
 
+llm_cache = setup_llm_cache()
+
 st.markdown(
     """
 # Hello!
@@ -19,4 +22,9 @@ Here are the apps I made:
 - [x] [Investor Assistant](/InvestorAssistantGPT)
 - [x] [Research Assistant(Assignment)](/ResearchAssistantGPT) 
 """
-)
\ No newline at end of file
+)
+
+with st.sidebar:
+    st.markdown("LLM cache")
+    for page, counters in llm_cache.stats().items():
+        st.caption(f"{page}: {counters['hits']} hits / {counters['misses']} misses")
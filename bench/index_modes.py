@@ -0,0 +1,69 @@
+"""Compare FAISS index modes: build time, query latency, size and recall@k.
+
+    python -m bench.index_modes --vectors 200000 --dimensions 384
+    python -m bench.index_modes --index-dir .cache/site/index
+
+Recall is measured against an exact flat index over the same vectors.
+With --index-dir the vectors are read back from a saved flat index, so the
+numbers reflect a real corpus instead of the synthetic clustered one.
+"""
+import argparse
+import os
+import time
+
+import numpy as np
+from langchain.vectorstores.faiss import dependable_faiss_import
+
+from utils.faiss_store import INDEX_FILE, make_index, recall_at_k
+
+
+def synthetic_vectors(count, dimensions, clusters=256):
+    rng = np.random.default_rng(0)
+    centers = rng.standard_normal((clusters, dimensions)).astype(np.float32)
+    vectors = centers[rng.integers(0, clusters, count)]
+    vectors += 0.3 * rng.standard_normal((count, dimensions)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def saved_vectors(index_dir):
+    faiss = dependable_faiss_import()
+    index = faiss.read_index(os.path.join(index_dir, INDEX_FILE))
+    return index.reconstruct_n(0, index.ntotal)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--vectors", type=int, default=100_000)
+    parser.add_argument("--dimensions", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--k", type=int, default=4)
+    parser.add_argument("--index-dir")
+    parser.add_argument("--modes", nargs="+", default=["flat", "ivf", "hnsw", "ivfpq"])
+    args = parser.parse_args()
+
+    faiss = dependable_faiss_import()
+    if args.index_dir:
+        vectors = saved_vectors(args.index_dir)
+    else:
+        vectors = synthetic_vectors(args.vectors, args.dimensions)
+    rng = np.random.default_rng(1)
+    queries = vectors[rng.choice(len(vectors), min(args.queries, len(vectors)), replace=False)]
+    queries = queries + 0.05 * rng.standard_normal(queries.shape).astype(np.float32)
+
+    print(f"{len(vectors)} vectors x {vectors.shape[1]} dims, {len(queries)} queries")
+    print(f"{'mode':<8} {'build s':>8} {'query ms':>9} {'size MB':>8} {'recall@' + str(args.k):>9}")
+    for mode in args.modes:
+        start = time.perf_counter()
+        index = make_index(vectors, mode)
+        index.add(vectors)
+        build = time.perf_counter() - start
+        start = time.perf_counter()
+        index.search(queries, args.k)
+        query = (time.perf_counter() - start) / len(queries) * 1000
+        size = len(faiss.serialize_index(index)) / 1024 / 1024
+        recall = recall_at_k(vectors, queries, index, args.k)
+        print(f"{mode:<8} {build:>8.2f} {query:>9.3f} {size:>8.1f} {recall:>9.3f}")
+
+
+if __name__ == "__main__":
+    main()
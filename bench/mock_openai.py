@@ -0,0 +1,541 @@
+"""Local stand-in for the OpenAI API used by the pages.
+
+Serves chat completions (plain, streaming and function calls), embeddings
+and the assistants/threads/runs endpoints with their SSE event stream.
+Latency and token rate are configurable so page timings are repeatable.
+
+    python -m bench.mock_openai --port 8765 --latency 0.3 --token-rate 40
+
+then start streamlit with OPENAI_BASE_URL=http://127.0.0.1:8765/v1 and
+OPENAI_API_BASE set to the same value.
+"""
+import argparse
+import base64
+import hashlib
+import json
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from itertools import count
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+
+WORDS = (
+    "the gateway caches requests and routes them to the model while vectorize "
+    "stores embeddings so workers can query indexes at the edge with low latency"
+).split()
+
+SAMPLE_ARGUMENTS = {
+    "company_name": "Apple",
+    "ticker": "AAPL",
+    "query": "Research about the XZ backdoor",
+    "term_name": "XZ backdoor",
+}
+
+
+def make_text(seed, tokens):
+    digest = int(hashlib.sha256(seed.encode("utf-8")).hexdigest(), 16)
+    return [
+        (" " if i else "") + WORDS[(digest + i * 7) % len(WORDS)] for i in range(tokens)
+    ]
+
+
+def make_vector(value, dimensions):
+    seed = int(hashlib.sha256(json.dumps(value).encode("utf-8")).hexdigest()[:8], 16)
+    vector = np.random.default_rng(seed).standard_normal(dimensions).astype(np.float32)
+    return vector / np.linalg.norm(vector)
+
+
+def make_quiz(seed, questions):
+    return {
+        "questions": [
+            {
+                "question": f"Question {i + 1} about {seed[:8]}?",
+                "answers": [
+                    {"answer": f"Answer {j + 1}", "correct": j == i % 4}
+                    for j in range(4)
+                ],
+            }
+            for i in range(questions)
+        ]
+    }
+
+
+class MockOpenAI:
+    def __init__(
+        self,
+        latency=0.3,
+        token_rate=40.0,
+        answer_tokens=60,
+        embedding_latency=0.05,
+        embedding_dimensions=1536,
+        host="127.0.0.1",
+        port=0,
+    ):
+        self.latency = latency
+        self.token_rate = token_rate
+        self.answer_tokens = answer_tokens
+        self.embedding_latency = embedding_latency
+        self.embedding_dimensions = embedding_dimensions
+        self.ids = count(1)
+        self.lock = threading.Lock()
+        self.assistants = {}
+        self.threads = {}
+        self.runs = {}
+        self.reset_stats()
+        self.server = ThreadingHTTPServer((host, port), self._handler_class())
+        self.server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def start(self):
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def reset_stats(self):
+        with self.lock:
+            self.stats = {
+                "requests": 0,
+                "first_token_at": None,
+                "last_response_at": None,
+                "tokens_out": 0,
+            }
+
+    def record_tokens(self, tokens):
+        with self.lock:
+            now = time.perf_counter()
+            if self.stats["first_token_at"] is None:
+                self.stats["first_token_at"] = now
+            self.stats["tokens_out"] += tokens
+            self.stats["last_response_at"] = now
+
+    def new_id(self, prefix):
+        return f"{prefix}_{next(self.ids):08d}"
+
+    # chat completions
+
+    def chat_completion(self, body):
+        messages = body.get("messages", [])
+        prompt = "\n".join(str(message.get("content") or "") for message in messages)
+        function_call = body.get("function_call")
+        if isinstance(function_call, dict) and function_call.get("name") == "create_quiz":
+            questions = re.search(r"make (\d+)", prompt)
+            arguments = json.dumps(
+                make_quiz(
+                    hashlib.sha256(prompt.encode("utf-8")).hexdigest(),
+                    int(questions.group(1)) if questions else 10,
+                )
+            )
+            message = {
+                "role": "assistant",
+                "content": None,
+                "function_call": {"name": "create_quiz", "arguments": arguments},
+            }
+            return message, [arguments], len(arguments) // 4
+        tokens = make_text(prompt, self.answer_tokens)
+        if "give a score" in prompt:
+            score = int(hashlib.sha256(prompt.encode("utf-8")).hexdigest(), 16) % 6
+            tokens.append(f"\nScore: {score}")
+        return {"role": "assistant", "content": "".join(tokens)}, tokens, len(tokens)
+
+    # assistants
+
+    def tool_rounds(self, assistant):
+        # 첫 라운드에 도구 하나, 다음 라운드에 나머지를 한꺼번에 요청한다
+        functions = [
+            tool["function"]
+            for tool in assistant.get("tools", [])
+            if tool.get("type") == "function"
+        ]
+        if len(functions) <= 1:
+            return [functions] if functions else []
+        return [functions[:1], functions[1:]]
+
+    def tool_arguments(self, function):
+        arguments = {}
+        properties = function.get("parameters", {}).get("properties", {})
+        for name, schema in properties.items():
+            if schema.get("type") == "array":
+                host, port = self.server.server_address[:2]
+                arguments[name] = [f"http://{host}:{port}/pages/{i}" for i in range(3)]
+            else:
+                arguments[name] = SAMPLE_ARGUMENTS.get(name, "test")
+        return json.dumps(arguments)
+
+    def message_object(self, thread_id, role, text, run=None):
+        return {
+            "id": self.new_id("msg"),
+            "object": "thread.message",
+            "created_at": int(time.time()),
+            "thread_id": thread_id,
+            "role": role,
+            "content": [{"type": "text", "text": {"value": text, "annotations": []}}],
+            "assistant_id": run["assistant_id"] if run else None,
+            "run_id": run["id"] if run else None,
+            "attachments": [],
+            "metadata": {},
+            "status": "completed",
+            "incomplete_details": None,
+            "completed_at": int(time.time()),
+            "incomplete_at": None,
+        }
+
+    def run_object(self, thread_id, assistant_id):
+        assistant = self.assistants[assistant_id]
+        return {
+            "id": self.new_id("run"),
+            "object": "thread.run",
+            "created_at": int(time.time()),
+            "assistant_id": assistant_id,
+            "thread_id": thread_id,
+            "status": "queued",
+            "required_action": None,
+            "last_error": None,
+            "expires_at": None,
+            "started_at": None,
+            "cancelled_at": None,
+            "failed_at": None,
+            "completed_at": None,
+            "incomplete_details": None,
+            "model": assistant["model"],
+            "instructions": assistant["instructions"],
+            "tools": assistant["tools"],
+            "metadata": {},
+            "usage": None,
+            "temperature": 1.0,
+            "top_p": 1.0,
+            "max_prompt_tokens": None,
+            "max_completion_tokens": None,
+            "truncation_strategy": {"type": "auto", "last_messages": None},
+            "response_format": "auto",
+            "tool_choice": "auto",
+            "parallel_tool_calls": True,
+            "_round": 0,
+        }
+
+    def public(self, obj):
+        return {key: value for key, value in obj.items() if not key.startswith("_")}
+
+    def _handler_class(self):
+        mock = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def _body(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                if not length:
+                    return {}
+                return json.loads(self.rfile.read(length))
+
+            def _json(self, payload, status=200):
+                data = json.dumps(payload).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def _start_stream(self):
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+
+            def _chunk(self, text):
+                data = text.encode("utf-8")
+                self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+                self.wfile.flush()
+
+            def _end_stream(self):
+                self.wfile.write(b"0\r\n\r\n")
+                self.wfile.flush()
+
+            def _event(self, event, data):
+                payload = data if isinstance(data, str) else json.dumps(data)
+                self._chunk(f"event: {event}\ndata: {payload}\n\n")
+
+            def do_GET(self):
+                url = urlparse(self.path)
+                path = url.path.removeprefix("/v1")
+                query = {key: values[0] for key, values in parse_qs(url.query).items()}
+                with mock.lock:
+                    mock.stats["requests"] += 1
+                parts = path.strip("/").split("/")
+                if parts[0] == "pages":
+                    html = (
+                        "<html><body><header>Docs</header><main><h1>Page "
+                        f"{parts[-1]}</h1><p>{''.join(make_text(path, 300))}</p>"
+                        "</main><footer>Footer</footer></body></html>"
+                    ).encode("utf-8")
+                    self.send_response(200)
+                    self.send_header("Content-Type", "text/html")
+                    self.send_header("Content-Length", str(len(html)))
+                    self.end_headers()
+                    self.wfile.write(html)
+                elif parts == ["assistants"]:
+                    self._list(list(mock.assistants.values()), query)
+                elif parts[0] == "assistants":
+                    self._json(mock.assistants[parts[1]])
+                elif len(parts) == 3 and parts[2] == "messages":
+                    self._list(mock.threads[parts[1]]["messages"], query)
+                elif len(parts) == 4 and parts[2] == "runs":
+                    self._json(mock.public(mock.runs[parts[3]]))
+                else:
+                    self._json({"error": {"message": f"Unknown path {path}"}}, 404)
+
+            def _list(self, items, query):
+                if query.get("order", "desc") == "desc":
+                    items = list(reversed(items))
+                if "after" in query:
+                    ids = [item["id"] for item in items]
+                    if query["after"] in ids:
+                        items = items[ids.index(query["after"]) + 1 :]
+                limit = int(query.get("limit", 20))
+                page = items[:limit]
+                self._json(
+                    {
+                        "object": "list",
+                        "data": page,
+                        "first_id": page[0]["id"] if page else None,
+                        "last_id": page[-1]["id"] if page else None,
+                        "has_more": len(items) > limit,
+                    }
+                )
+
+            def do_POST(self):
+                path = urlparse(self.path).path.removeprefix("/v1")
+                body = self._body()
+                with mock.lock:
+                    mock.stats["requests"] += 1
+                parts = path.strip("/").split("/")
+                if parts == ["chat", "completions"]:
+                    self._chat(body)
+                elif parts == ["embeddings"]:
+                    self._embeddings(body)
+                elif parts == ["assistants"]:
+                    assistant = {
+                        "id": mock.new_id("asst"),
+                        "object": "assistant",
+                        "created_at": int(time.time()),
+                        "name": body.get("name"),
+                        "description": body.get("description"),
+                        "model": body.get("model"),
+                        "instructions": body.get("instructions"),
+                        "tools": body.get("tools", []),
+                        "metadata": body.get("metadata") or {},
+                        "temperature": 1.0,
+                        "top_p": 1.0,
+                        "response_format": "auto",
+                        "tool_resources": {},
+                    }
+                    mock.assistants[assistant["id"]] = assistant
+                    self._json(assistant)
+                elif parts == ["threads"]:
+                    thread = {
+                        "id": mock.new_id("thread"),
+                        "object": "thread",
+                        "created_at": int(time.time()),
+                        "metadata": {},
+                        "tool_resources": {},
+                        "messages": [],
+                    }
+                    mock.threads[thread["id"]] = thread
+                    self._json(mock.public({k: v for k, v in thread.items() if k != "messages"}))
+                elif len(parts) == 3 and parts[2] == "messages":
+                    content = body.get("content")
+                    if isinstance(content, list):
+                        content = " ".join(part.get("text", "") for part in content)
+                    message = mock.message_object(parts[1], body.get("role", "user"), content)
+                    mock.threads[parts[1]]["messages"].append(message)
+                    self._json(message)
+                elif len(parts) == 3 and parts[2] == "runs":
+                    run = mock.run_object(parts[1], body["assistant_id"])
+                    mock.runs[run["id"]] = run
+                    self._run_stream(run, created=True)
+                elif len(parts) == 5 and parts[4] == "submit_tool_outputs":
+                    run = mock.runs[parts[3]]
+                    run["required_action"] = None
+                    run["_round"] += 1
+                    self._run_stream(run, created=False)
+                else:
+                    self._json({"error": {"message": f"Unknown path {path}"}}, 404)
+
+            def _chat(self, body):
+                time.sleep(mock.latency)
+                message, tokens, token_count = mock.chat_completion(body)
+                completion_id = mock.new_id("chatcmpl")
+                base = {
+                    "id": completion_id,
+                    "created": int(time.time()),
+                    "model": body.get("model", "gpt-3.5-turbo"),
+                }
+                if not body.get("stream"):
+                    time.sleep(token_count / mock.token_rate)
+                    mock.record_tokens(token_count)
+                    self._json(
+                        {
+                            **base,
+                            "object": "chat.completion",
+                            "choices": [
+                                {"index": 0, "message": message, "finish_reason": "stop"}
+                            ],
+                            "usage": {
+                                "prompt_tokens": 0,
+                                "completion_tokens": token_count,
+                                "total_tokens": token_count,
+                            },
+                        }
+                    )
+                    return
+                self._start_stream()
+                for token in tokens:
+                    time.sleep(1 / mock.token_rate)
+                    mock.record_tokens(1)
+                    chunk = {
+                        **base,
+                        "object": "chat.completion.chunk",
+                        "choices": [
+                            {"index": 0, "delta": {"content": token}, "finish_reason": None}
+                        ],
+                    }
+                    self._chunk(f"data: {json.dumps(chunk)}\n\n")
+                chunk = {
+                    **base,
+                    "object": "chat.completion.chunk",
+                    "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}],
+                }
+                self._chunk(f"data: {json.dumps(chunk)}\n\n")
+                self._chunk("data: [DONE]\n\n")
+                self._end_stream()
+
+            def _embeddings(self, body):
+                inputs = body["input"]
+                if not isinstance(inputs, list) or (inputs and isinstance(inputs[0], int)):
+                    inputs = [inputs]
+                time.sleep(mock.embedding_latency)
+                data = []
+                for i, value in enumerate(inputs):
+                    vector = make_vector(value, mock.embedding_dimensions)
+                    if body.get("encoding_format") == "base64":
+                        embedding = base64.b64encode(vector.tobytes()).decode("ascii")
+                    else:
+                        embedding = vector.tolist()
+                    data.append({"object": "embedding", "index": i, "embedding": embedding})
+                self._json(
+                    {
+                        "object": "list",
+                        "data": data,
+                        "model": body.get("model"),
+                        "usage": {"prompt_tokens": 0, "total_tokens": 0},
+                    }
+                )
+
+            def _run_stream(self, run, created):
+                self._start_stream()
+                if created:
+                    self._event("thread.run.created", mock.public(run))
+                    self._event("thread.run.queued", mock.public(run))
+                run["status"] = "in_progress"
+                self._event("thread.run.in_progress", mock.public(run))
+                time.sleep(mock.latency)
+                rounds = mock.tool_rounds(mock.assistants[run["assistant_id"]])
+                if run["_round"] < len(rounds):
+                    run["status"] = "requires_action"
+                    run["required_action"] = {
+                        "type": "submit_tool_outputs",
+                        "submit_tool_outputs": {
+                            "tool_calls": [
+                                {
+                                    "id": mock.new_id("call"),
+                                    "type": "function",
+                                    "function": {
+                                        "name": function["name"],
+                                        "arguments": mock.tool_arguments(function),
+                                    },
+                                }
+                                for function in rounds[run["_round"]]
+                            ]
+                        },
+                    }
+                    self._event("thread.run.requires_action", mock.public(run))
+                else:
+                    self._answer(run)
+                self._event("done", "[DONE]")
+                self._end_stream()
+
+            def _answer(self, run):
+                thread = mock.threads[run["thread_id"]]
+                message = mock.message_object(run["thread_id"], "assistant", "", run)
+                message["status"] = "in_progress"
+                message["content"] = []
+                self._event("thread.message.created", message)
+                self._event("thread.message.in_progress", message)
+                tokens = make_text(run["id"], mock.answer_tokens)
+                for i, token in enumerate(tokens):
+                    time.sleep(1 / mock.token_rate)
+                    mock.record_tokens(1)
+                    text = {"value": token}
+                    if i == 0:
+                        text["annotations"] = []
+                    self._event(
+                        "thread.message.delta",
+                        {
+                            "id": message["id"],
+                            "object": "thread.message.delta",
+                            "delta": {
+                                "content": [{"index": 0, "type": "text", "text": text}]
+                            },
+                        },
+                    )
+                message["status"] = "completed"
+                message["content"] = [
+                    {"type": "text", "text": {"value": "".join(tokens), "annotations": []}}
+                ]
+                thread["messages"].append(message)
+                self._event("thread.message.completed", message)
+                run["status"] = "completed"
+                run["completed_at"] = int(time.time())
+                self._event("thread.run.completed", mock.public(run))
+
+        return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.3)
+    parser.add_argument("--token-rate", type=float, default=40.0)
+    parser.add_argument("--answer-tokens", type=int, default=60)
+    args = parser.parse_args()
+    mock = MockOpenAI(
+        latency=args.latency,
+        token_rate=args.token_rate,
+        answer_tokens=args.answer_tokens,
+        host=args.host,
+        port=args.port,
+    )
+    print(f"Mock OpenAI API listening on {mock.base_url}")
+    try:
+        mock.server.serve_forever()
+    except KeyboardInterrupt:
+        mock.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,316 @@
+"""End-to-end latency benchmark for every page against the mock OpenAI API.
+
+    python -m bench.pages --iterations 10 --pages DocumentGPT SiteGPT
+
+Each page runs in streamlit's AppTest from a scratch working directory.
+OpenAI calls go to bench.mock_openai; the sitemap crawl, Wikipedia,
+DuckDuckGo and yfinance are replaced with local fixtures, so no API key is
+needed. tiktoken's BPE files are the one remaining download: gpt2 for
+splitting with --embeddings openai, and cl100k_base for QuizGPT, the
+assistant pages and OpenAI batch packing. On an offline machine point
+TIKTOKEN_CACHE_DIR at a directory that already holds them; with
+--embeddings hashing, DocumentGPT and SiteGPT need neither. The run stops
+up front if a required file cannot be loaded. For every page it reports p50/p95 time-to-first-token
+(first streamed token, or the first completed response for non-streaming
+pages), p50/p95 total latency and output tokens per second.
+"""
+import argparse
+import io
+import os
+import sys
+import tempfile
+import time
+from contextlib import ExitStack
+from unittest import mock as patch
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+API_KEY = "sk-bench"
+SITE_URLS = [
+    f"https://developers.cloudflare.com/{section}/page-{i}/"
+    for section in ("ai-gateway", "vectorize", "workers-ai")
+    for i in range(5)
+]
+
+
+class BenchUpload(io.BytesIO):
+    def __init__(self, name, content):
+        super().__init__(content)
+        self.name = name
+        self.type = "text/plain"
+        self.size = len(content)
+
+
+def make_document(paragraphs=200):
+    lines = []
+    for i in range(paragraphs):
+        lines.append(
+            f"Section {i}. Workers AI model number {i} costs {i % 7} dollars per "
+            f"1M input tokens and supports {i % 3 + 1} regions.\n"
+        )
+    return "".join(lines).encode("utf-8")
+
+
+def make_sitemap():
+    from bs4 import BeautifulSoup
+
+    urls = "".join(
+        f"<url><loc>{url}</loc><lastmod>2024-01-01</lastmod></url>" for url in SITE_URLS
+    )
+    return BeautifulSoup(
+        '<?xml version="1.0" encoding="UTF-8"?>'
+        f'<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">{urls}</urlset>',
+        "xml",
+    )
+
+
+def make_site_page(url):
+    from bs4 import BeautifulSoup
+
+    body = " ".join(f"{url} paragraph {i} about limits and pricing." for i in range(150))
+    return BeautifulSoup(
+        f"<html><header>Nav</header><main><p>{body}</p></main><footer>F</footer></html>",
+        "html.parser",
+    )
+
+
+class FakeTicker:
+    def __init__(self, ticker):
+        import pandas as pd
+
+        periods = pd.to_datetime(["2023-09-30", "2022-09-30", "2021-09-30", "2020-09-30"])
+        rows = ["Total Revenue", "Gross Profit", "Operating Income", "Net Income"]
+        self.income_stmt = pd.DataFrame(
+            np.arange(len(rows) * 4, dtype=float).reshape(len(rows), 4) * 1e9,
+            index=rows,
+            columns=periods,
+        )
+        self.balance_sheet = self.income_stmt.rename(
+            index=dict(zip(rows, ["Total Assets", "Total Debt", "Cash", "Equity"]))
+        )
+        self._history = pd.DataFrame(
+            {
+                "Open": np.linspace(150, 180, 63),
+                "High": np.linspace(151, 181, 63),
+                "Low": np.linspace(149, 179, 63),
+                "Close": np.linspace(150, 180, 63),
+                "Volume": np.full(63, 5e7),
+            },
+            index=pd.bdate_range(end="2024-03-29", periods=63),
+        )
+
+    def history(self, period="1mo", **kwargs):
+        return self._history
+
+
+def offline_dependencies(upload):
+    from langchain.document_loaders.sitemap import SitemapLoader
+    from langchain.retrievers import WikipediaRetriever
+    from langchain.schema import Document
+    from langchain.utilities.duckduckgo_search import DuckDuckGoSearchAPIWrapper
+    from langchain.utilities.wikipedia import WikipediaAPIWrapper
+    import streamlit
+    import yfinance
+
+    def wiki_documents(self, query, **kwargs):
+        return [
+            Document(
+                page_content=" ".join(f"{query} fact {i}." for i in range(300)),
+                metadata={"title": f"{query} {n}"},
+            )
+            for n in range(5)
+        ]
+
+    stack = ExitStack()
+    stack.enter_context(patch.patch.object(streamlit, "file_uploader", lambda *a, **k: upload))
+    stack.enter_context(
+        patch.patch.object(SitemapLoader, "scrape", lambda self, *a, **k: make_sitemap())
+    )
+    stack.enter_context(
+        patch.patch.object(
+            SitemapLoader,
+            "scrape_all",
+            lambda self, urls, *a, **k: [make_site_page(url) for url in urls],
+        )
+    )
+    stack.enter_context(
+        patch.patch.object(WikipediaRetriever, "get_relevant_documents", wiki_documents)
+    )
+    stack.enter_context(
+        patch.patch.object(
+            DuckDuckGoSearchAPIWrapper,
+            "run",
+            lambda self, query: f"{query}: Apple Inc. (NASDAQ: AAPL) is listed on NASDAQ.",
+        )
+    )
+    stack.enter_context(
+        patch.patch.object(
+            WikipediaAPIWrapper,
+            "run",
+            lambda self, query: f"Page: {query}\nSummary: {query} is a software backdoor.",
+        )
+    )
+    stack.enter_context(patch.patch.object(yfinance, "Ticker", FakeTicker))
+    return stack
+
+
+def enter_key(at):
+    at.run()
+    at.sidebar.text_input[0].input(API_KEY).run()
+
+
+def setup_quiz(at):
+    enter_key(at)
+    at.sidebar.selectbox[1].select("Wikipedia Article").run()
+
+
+PAGES = {
+    "DocumentGPT": (
+        "pages/01_DocumentGPT.py",
+        enter_key,
+        lambda at, i: at.chat_input[0].set_value(f"How much does model {i} cost?").run(),
+    ),
+    "QuizGPT": (
+        "pages/03_QuizGPT.py",
+        setup_quiz,
+        lambda at, i: at.sidebar.text_input[1].input(f"Benchmark topic {i}").run(),
+    ),
+    "SiteGPT": (
+        "pages/04_SiteGPT.py",
+        enter_key,
+        lambda at, i: at.main.text_input[0].input(f"What are the limits of index {i}?").run(),
+    ),
+    "InvestorAssistantGPT": (
+        "pages/05_InvestorAssistantGPT.py",
+        enter_key,
+        lambda at, i: at.chat_input[0].set_value(f"Should I buy Apple stock? ({i})").run(),
+    ),
+    "ResearchAssistantGPT": (
+        "pages/06_ResearchAssistantGPT.py",
+        enter_key,
+        lambda at, i: at.chat_input[0].set_value(f"Research about the XZ backdoor ({i})").run(),
+    ),
+}
+
+
+def check(at, page):
+    if at.exception:
+        raise RuntimeError(f"{page} raised: {at.exception[0].value}")
+
+
+def bench_page(server, page, iterations, timeout):
+    from streamlit.testing.v1 import AppTest
+
+    path, setup, interact = PAGES[page]
+    at = AppTest.from_file(os.path.join(ROOT, path), default_timeout=timeout)
+    setup(at)
+    check(at, page)
+    results = []
+    for i in range(iterations):
+        server.reset_stats()
+        start = time.perf_counter()
+        interact(at, i)
+        total = time.perf_counter() - start
+        check(at, page)
+        stats = dict(server.stats)
+        first_token = stats["first_token_at"]
+        results.append(
+            {
+                "ttft": (first_token - start) if first_token else total,
+                "total": total,
+                "tokens": stats["tokens_out"],
+                "requests": stats["requests"],
+            }
+        )
+    return results
+
+
+def required_encodings(pages, embeddings):
+    from utils.embedding_pipeline import OFFLINE_ENCODING
+    from utils.embeddings import splitter_encoding
+
+    names = {splitter_encoding(embeddings)} - {OFFLINE_ENCODING}
+    if embeddings == "openai" or set(pages) - {"DocumentGPT", "SiteGPT"}:
+        names.add("cl100k_base")
+    return sorted(names)
+
+
+def check_encodings(names):
+    from utils.embedding_pipeline import get_encoding
+
+    for name in names:
+        try:
+            get_encoding(name)
+        except Exception as e:
+            sys.exit(
+                f"Could not load the tiktoken encoding {name!r} ({type(e).__name__}). "
+                "Set TIKTOKEN_CACHE_DIR to a directory holding its BPE files, "
+                "or run with --embeddings hashing and --pages DocumentGPT SiteGPT."
+            )
+
+
+def summarize(page, results):
+    ttft = np.array([result["ttft"] for result in results])
+    total = np.array([result["total"] for result in results])
+    tokens = sum(result["tokens"] for result in results)
+    return (
+        f"{page:<22} {len(results):>4} "
+        f"{np.percentile(ttft, 50):>9.3f} {np.percentile(ttft, 95):>9.3f} "
+        f"{np.percentile(total, 50):>9.3f} {np.percentile(total, 95):>9.3f} "
+        f"{tokens / total.sum():>9.1f} "
+        f"{np.mean([result['requests'] for result in results]):>8.1f}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pages", nargs="+", default=list(PAGES), choices=list(PAGES))
+    parser.add_argument("--iterations", type=int, default=5)
+    parser.add_argument("--latency", type=float, default=0.3)
+    parser.add_argument("--token-rate", type=float, default=40.0)
+    parser.add_argument("--answer-tokens", type=int, default=60)
+    parser.add_argument("--embeddings", default="openai", choices=["openai", "hashing"])
+    parser.add_argument("--timeout", type=float, default=300)
+    args = parser.parse_args()
+
+    from bench.mock_openai import MockOpenAI
+
+    server = MockOpenAI(
+        latency=args.latency,
+        token_rate=args.token_rate,
+        answer_tokens=args.answer_tokens,
+    ).start()
+    os.environ.update(
+        {
+            "OPENAI_API_KEY": API_KEY,
+            "OPENAI_BASE_URL": server.base_url,
+            "OPENAI_API_BASE": server.base_url,
+            "EMBEDDINGS_PROVIDER": args.embeddings,
+            # 퀴즈 풀 백그라운드 생성이 mock 서버에 요청을 보내 측정값이 섞이지 않게 끈다
+            "QUIZ_POOL_ENABLED": "0",
+        }
+    )
+    sys.path.insert(0, ROOT)
+    check_encodings(required_encodings(args.pages, args.embeddings))
+    workdir = tempfile.mkdtemp(prefix="bench-pages-")
+    for name in ("files", "embeddings", "quiz_files", "indexes", "site"):
+        os.makedirs(os.path.join(workdir, ".cache", name))
+    os.chdir(workdir)
+
+    upload = BenchUpload("bench.txt", make_document())
+    print(
+        f"{'page':<22} {'runs':>4} {'ttft p50':>9} {'ttft p95':>9} "
+        f"{'total p50':>9} {'total p95':>9} {'tok/s':>9} {'requests':>8}"
+    )
+    try:
+        with offline_dependencies(upload):
+            for page in args.pages:
+                results = bench_page(server, page, args.iterations, args.timeout)
+                print(summarize(page, results))
+    finally:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
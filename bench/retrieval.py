@@ -0,0 +1,98 @@
+"""Retrieval quality of plain vector search against the hybrid BM25 + vector retriever.
+
+    python -m bench.retrieval --models 60 --embeddings hashing
+
+The corpus mimics the Workers AI pricing and limits pages: many chunks that
+read almost the same and differ only in a model name or a number, which is
+where "price per 1M input tokens of llama-2-7b-chat-fp16" style questions
+go wrong. Each question has exactly one relevant chunk. The report shows
+hit rate and MRR at each retriever's k, plus the context tokens the answer
+prompt would carry.
+"""
+import argparse
+import random
+import time
+
+from langchain.schema import Document
+from langchain.vectorstores.faiss import FAISS
+
+from utils.embedding_pipeline import get_encoding
+from utils.embeddings import get_embeddings
+from utils.hybrid_retriever import HybridRetriever
+
+FAMILIES = ["llama-2", "mistral", "gemma", "qwen1.5", "phi-2", "deepseek-coder", "falcon", "zephyr"]
+VARIANTS = ["chat-fp16", "instruct-awq", "chat-int8", "base-lora", "instruct-v0.1"]
+SIZES = ["0.5b", "1.8b", "2b", "7b", "13b"]
+
+
+def make_corpus(models, seed=0):
+    rng = random.Random(seed)
+    names = sorted({
+        f"{rng.choice(FAMILIES)}-{rng.choice(SIZES)}-{rng.choice(VARIANTS)}"
+        for _ in range(models * 3)
+    })[:models]
+    docs = []
+    questions = []
+    for name in names:
+        input_price = round(rng.uniform(0.01, 1.5), 3)
+        output_price = round(rng.uniform(0.05, 3.0), 3)
+        context = rng.choice([2048, 4096, 8192, 32768])
+        docs.append(
+            Document(
+                page_content=(
+                    f"Model @cf/meta/{name}. Workers AI pricing for this text generation model "
+                    f"is ${input_price} per 1M input tokens and ${output_price} per 1M output "
+                    f"tokens. The context window is {context} tokens. Requests are billed in "
+                    "neurons and the free allocation resets daily."
+                ),
+                metadata={"source": name},
+            )
+        )
+        questions.append((f"What is the price per 1M input tokens of the {name} model?", name))
+    filler = [
+        "AI Gateway lets you cache, rate limit and log requests to model providers.",
+        "Vectorize indexes store embeddings; a single account can have up to 100 indexes.",
+        "Workers AI runs inference on serverless GPUs close to your users.",
+    ]
+    for i in range(models):
+        docs.append(Document(page_content=f"{filler[i % len(filler)]} Section {i}.", metadata={"source": f"filler-{i}"}))
+    return docs, questions
+
+
+def evaluate(retriever, questions):
+    encoding = get_encoding()
+    hits = reciprocal = tokens = 0
+    start = time.perf_counter()
+    for question, source in questions:
+        docs = retriever.get_relevant_documents(question)
+        sources = [doc.metadata["source"] for doc in docs]
+        if source in sources:
+            hits += 1
+            reciprocal += 1 / (sources.index(source) + 1)
+        tokens += sum(len(encoding.encode_ordinary(doc.page_content)) for doc in docs)
+    elapsed = (time.perf_counter() - start) * 1000 / len(questions)
+    return hits / len(questions), reciprocal / len(questions), tokens / len(questions), elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--models", type=int, default=60)
+    parser.add_argument("--embeddings", choices=["openai", "hashing"], default="hashing")
+    args = parser.parse_args()
+
+    docs, questions = make_corpus(args.models)
+    vectorstore = FAISS.from_documents(docs, get_embeddings(args.embeddings))
+    retrievers = [
+        ("vector k=4", vectorstore.as_retriever()),
+        ("vector k=3", vectorstore.as_retriever(search_kwargs={"k": 3})),
+        ("hybrid k=3", HybridRetriever.from_vectorstore(vectorstore)),
+    ]
+    print(f"{len(docs)} chunks, {len(questions)} questions, {args.embeddings} embeddings")
+    print(f"{'retriever':<11} {'hit rate':>8} {'MRR':>6} {'ctx tokens':>10} {'ms/query':>9}")
+    for name, retriever in retrievers:
+        hit_rate, mrr, tokens, elapsed = evaluate(retriever, questions)
+        print(f"{name:<11} {hit_rate:>8.2f} {mrr:>6.2f} {tokens:>10.0f} {elapsed:>9.2f}")
+
+
+if __name__ == "__main__":
+    main()
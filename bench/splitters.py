@@ -0,0 +1,97 @@
+"""Compare langchain's from_tiktoken_encoder splitters with FastTokenSplitter.
+
+    python -m bench.splitters --paragraphs 20000 --repeat 3
+
+Both configurations used by the pages are measured: the "\\n" separated
+600/100 splitter (DocumentGPT, QuizGPT) and the recursive 1000/200 one
+(SiteGPT), on a mixed English/Korean text and on a spaceless CJK/emoji
+text whose multi-byte characters get split across BPE tokens. The report
+shows the best of --repeat runs and whether every chunk matches the
+langchain output.
+"""
+import argparse
+import random
+import time
+
+from langchain.text_splitter import CharacterTextSplitter, RecursiveCharacterTextSplitter
+
+from utils.text_splitter import FastTokenSplitter, token_byte_lengths
+
+WORDS = (
+    "the model price per 1M input tokens llama-2-7b-chat-fp16 is $0.19 Workers AI "
+    "gateway caches requests, Vectorize stores embeddings in indexes. 가격은 얼마인가요"
+).split(" ")
+# 공백 없이 이어 붙이면 멀티바이트 글자가 여러 토큰에 걸친다
+CJK_WORDS = "価格はいくらですか 向量数据库 임베딩을저장합니다 🚀 👍🏽 ✨ 日本語".split(" ")
+
+
+def make_text(paragraphs, seed=0, words=WORDS, joiner=" "):
+    rng = random.Random(seed)
+    blocks = []
+    for _ in range(paragraphs):
+        lines = []
+        for _ in range(rng.randint(1, 8)):
+            indent = "  " if rng.random() < 0.1 else ""
+            lines.append(indent + joiner.join(rng.choice(words) for _ in range(rng.randint(0, 60))))
+        blocks.append("\n".join(lines))
+    return "\n\n".join(blocks)
+
+
+def best_of(repeat, split, text):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        chunks = split(text)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, chunks
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--paragraphs", type=int, default=20_000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    texts = [
+        ("mixed", make_text(args.paragraphs)),
+        ("cjk", make_text(args.paragraphs // 4, words=CJK_WORDS, joiner="")),
+    ]
+    token_byte_lengths("gpt2")
+    cases = [
+        (
+            "char 600/100",
+            CharacterTextSplitter.from_tiktoken_encoder(
+                separator="\n", chunk_size=600, chunk_overlap=100
+            ),
+            FastTokenSplitter(
+                separators=["\n"], chunk_size=600, chunk_overlap=100, encoding_name="gpt2"
+            ),
+        ),
+        (
+            "recursive 1000/200",
+            RecursiveCharacterTextSplitter.from_tiktoken_encoder(
+                chunk_size=1000, chunk_overlap=200
+            ),
+            FastTokenSplitter(
+                recursive=True, chunk_size=1000, chunk_overlap=200, encoding_name="gpt2"
+            ),
+        ),
+    ]
+    for label, text in texts:
+        print(f"{label}: {len(text) / 1e6:.1f}M characters")
+    print(
+        f"{'text':<6} {'splitter':<19} {'langchain s':>11} {'fast s':>8} {'speedup':>8} "
+        f"{'chunks':>7} {'same':>5}"
+    )
+    for label, text in texts:
+        for name, baseline, fast in cases:
+            baseline_time, expected = best_of(args.repeat, baseline.split_text, text)
+            fast_time, chunks = best_of(args.repeat, fast.split_text, text)
+            print(
+                f"{label:<6} {name:<19} {baseline_time:>11.2f} {fast_time:>8.2f} "
+                f"{baseline_time / fast_time:>7.1f}x {len(chunks):>7} {str(chunks == expected):>5}"
+            )
+
+if __name__ == "__main__":
+    main()
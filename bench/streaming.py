@@ -0,0 +1,76 @@
+"""Compare per-token re-rendering with the throttled StreamingRenderer.
+
+    python -m bench.streaming --tokens 2000 --token-rate 100
+
+Every markdown() call is serialized to the same protobuf streamlit sends
+over the websocket, so the reported bytes and CPU time follow what the
+browser actually receives. The final text of both runs must match.
+"""
+import argparse
+import time
+
+from streamlit.proto.Markdown_pb2 import Markdown
+
+from utils.streaming import StreamingRenderer, escape_dollars
+
+
+class RecordingBox:
+    def __init__(self):
+        self.renders = 0
+        self.bytes_sent = 0
+        self.last = ""
+
+    def markdown(self, body):
+        message = Markdown()
+        message.body = body
+        self.bytes_sent += len(message.SerializeToString())
+        self.renders += 1
+        self.last = body
+
+
+def make_tokens(count):
+    words = ["revenue", "grew", "$", "12.5B", "in", "the", "quarter,", "while", "margins", "held."]
+    return [f" {words[i % len(words)]}" for i in range(count)]
+
+
+def per_token(tokens, delay):
+    box = RecordingBox()
+    message = ""
+    for token in tokens:
+        time.sleep(delay)
+        message += token
+        box.markdown(escape_dollars(message))
+    return box
+
+
+def throttled(tokens, delay):
+    box = RecordingBox()
+    renderer = StreamingRenderer(box=box, escape=True)
+    for token in tokens:
+        time.sleep(delay)
+        renderer.append(token)
+    renderer.finish()
+    return box
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tokens", type=int, default=2000)
+    parser.add_argument("--token-rate", type=float, default=100, help="tokens per second, 0 for no delay")
+    args = parser.parse_args()
+
+    tokens = make_tokens(args.tokens)
+    delay = 1 / args.token_rate if args.token_rate else 0
+    expected = escape_dollars("".join(tokens))
+    print(f"{args.tokens} tokens at {args.token_rate or 'unlimited'} tok/s")
+    print(f"{'renderer':<10} {'renders':>8} {'bytes':>12} {'cpu ms':>8}")
+    for name, run in (("per-token", per_token), ("throttled", throttled)):
+        start = time.process_time()
+        box = run(tokens, delay)
+        cpu = (time.process_time() - start) * 1000
+        assert box.last == expected, f"{name} final render differs from the full answer"
+        print(f"{name:<10} {box.renders:>8} {box.bytes_sent:>12,} {cpu:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,32 +1,44 @@
 from langchain.prompts import ChatPromptTemplate
-from langchain.document_loaders import UnstructuredFileLoader
-from langchain.embeddings import CacheBackedEmbeddings, OpenAIEmbeddings
 from langchain.schema.runnable import RunnableLambda, RunnablePassthrough
-from langchain.storage import LocalFileStore
-from langchain.text_splitter import CharacterTextSplitter
-from langchain.vectorstores.faiss import FAISS
 from langchain.chat_models import ChatOpenAI
 from langchain.callbacks.base import BaseCallbackHandler
 import streamlit as st
+import os
+from utils.embeddings import get_cached_embeddings, get_embeddings, provider_path
+from utils.faiss_store import (
+    build_index,
+    index_exists,
+    load_index,
+    save_index,
+)
+from utils.hybrid_retriever import HybridRetriever
+from utils.ingest import hash_upload, ingest_file, save_upload
+from utils.llm_cache import use_llm_cache
+from utils.semantic_cache import get_semantic_cache
+from utils.streaming import StreamingRenderer
+from utils.text_splitter import FastTokenSplitter
 
 st.set_page_config(
     page_title="DocumentGPT",
     page_icon="📃",
 )
 
+use_llm_cache("DocumentGPT")
+
 
 class ChatCallbackHandler(BaseCallbackHandler):
     message = ""
 
     def on_llm_start(self, *args, **kwargs):
-        self.message_box = st.empty()
+        self.renderer = StreamingRenderer()
 
-    def on_llm_end(self, *args, **kwargs):
+    def on_llm_end(self, response, *args, **kwargs):
+        # 캐시에서 온 응답은 토큰 스트림 없이 끝난다
+        self.message = self.renderer.finish(response.generations[0][0].text)
         save_message(self.message, "ai")
 
     def on_llm_new_token(self, token, *args, **kwargs):
-        self.message += token
-        self.message_box.markdown(self.message)
+        self.renderer.append(token)
 
 
 openapi_key = st.sidebar.text_input("OpenAI API KEY : ")
@@ -41,25 +53,34 @@ llm = ChatOpenAI(
 )
 
 
-@st.cache_data(show_spinner="Embedding file...")
+@st.cache_resource(show_spinner="Embedding file...")
 def embed_file(file):
-    file_content = file.read()
-    file_path = f"./.cache/files/{file.name}"
-    with open(file_path, "wb") as f:
-        f.write(file_content)
-    cache_dir = LocalFileStore(f"./.cache/embeddings/{file.name}")
-    splitter = CharacterTextSplitter.from_tiktoken_encoder(
-        separator="\n",
+    # 파일 해시는 시맨틱 캐시 이름에도 쓰므로 함께 돌려준다 (다시 실행할 때마다 해시하지 않도록)
+    file_hash = hash_upload(file)
+    index_dir = provider_path(f"./.cache/indexes/{file_hash}")
+    cached_embeddings = get_cached_embeddings(file_hash)
+    if index_exists(index_dir):
+        return file_hash, HybridRetriever.from_vectorstore(load_index(index_dir, cached_embeddings))
+    extension = os.path.splitext(file.name)[1]
+    file_path = save_upload(file, f"./.cache/files/{file_hash}{extension}")
+    splitter = FastTokenSplitter(
+        separators=["\n"],
         chunk_size=600,
         chunk_overlap=100,
     )
-    loader = UnstructuredFileLoader(file_path)
-    docs = loader.load_and_split(text_splitter=splitter)
-    embeddings = OpenAIEmbeddings()
-    cached_embeddings = CacheBackedEmbeddings.from_bytes_store(embeddings, cache_dir)
-    vectorstore = FAISS.from_documents(docs, cached_embeddings)
-    retriever = vectorstore.as_retriever()
-    return retriever
+    progress = st.progress(0.0, text="Reading file...")
+    docs = ingest_file(
+        file_path,
+        splitter,
+        cached_embeddings,
+        on_progress=lambda done, total: progress.progress(
+            done / total, text=f"Reading file... {done}/{total}"
+        ),
+    )
+    progress.empty()
+    vectorstore = build_index(docs, cached_embeddings)
+    save_index(vectorstore, index_dir)
+    return file_hash, HybridRetriever.from_vectorstore(vectorstore)
 
 
 def save_message(message, role):
@@ -123,22 +144,32 @@ with st.sidebar:
     )
 
 if file:
-    retriever = embed_file(file)
+    try:
+        file_hash, retriever = embed_file(file)
+    except ValueError as e:
+        st.error(str(e))
+        st.stop()
     send_message("I'm ready! Ask away!", "ai", save=False)
     paint_history()
+    semantic_cache = get_semantic_cache(provider_path(file_hash), get_embeddings())
     message = st.chat_input("Ask anything about your file...")
     if message:
         send_message(message, "human")
-        chain = (
-            {
-                "context": retriever | RunnableLambda(format_docs),
-                "question": RunnablePassthrough(),
-            }
-            | prompt
-            | llm
-        )
-        with st.chat_message("ai"):
-            response = chain.invoke(message)
+        cached_answer = semantic_cache.lookup(message)
+        if cached_answer:
+            send_message(cached_answer, "ai")
+        else:
+            chain = (
+                {
+                    "context": retriever | RunnableLambda(format_docs),
+                    "question": RunnablePassthrough(),
+                }
+                | prompt
+                | llm
+            )
+            with st.chat_message("ai"):
+                response = chain.invoke(message)
+            semantic_cache.update(message, response.content)
 
 
 else:
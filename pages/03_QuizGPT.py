@@ -1,118 +1,82 @@
-import json
-from langchain.document_loaders import UnstructuredFileLoader
-from langchain.text_splitter import CharacterTextSplitter
-from langchain.chat_models import ChatOpenAI
-from langchain.prompts import ChatPromptTemplate
 from langchain.callbacks import StreamingStdOutCallbackHandler
 import streamlit as st
 from langchain.retrievers import WikipediaRetriever
 from langchain.schema import BaseOutputParser, output_parser
+from utils.ingest import ingest_file, save_upload
+from utils.llm_cache import use_llm_cache
+from utils.quiz import QUIZ_QUESTIONS, generate_quiz, make_quiz_llm
+from utils.quiz_pool import get_quiz_pool, pool_settings
+from utils.quiz_store import get_quiz_store, model_settings, quiz_key, topic_key
+from utils.text_splitter import FastTokenSplitter
 
 st.set_page_config(
     page_title="QuizGPT",
     page_icon="❓",
 )
 
-st.title("QuizGPT (Assignment)")
+use_llm_cache("QuizGPT")
 
+st.title("QuizGPT (Assignment)")
 
-function = {
-    "name": "create_quiz",
-    "description": "function that takes a list of questions and answers and returns a quiz",
-    "parameters": {
-        "type": "object",
-        "properties": {
-            "questions": {
-                "type": "array",
-                "items": {
-                    "type": "object",
-                    "properties": {
-                        "question": {
-                            "type": "string",
-                        },
-                        "answers": {
-                            "type": "array",
-                            "items": {
-                                "type": "object",
-                                "properties": {
-                                    "answer": {
-                                        "type": "string",
-                                    },
-                                    "correct": {
-                                        "type": "boolean",
-                                    },
-                                },
-                                "required": ["answer", "correct"],
-                            },
-                        },
-                    },
-                    "required": ["question", "answers"],
-                },
-            }
-        },
-        "required": ["questions"],
-    },
-}
 
 openapi_key = st.sidebar.text_input("OpenAI API KEY : ")
  
-llm = ChatOpenAI(
-    temperature=0.1,
-    openai_api_key=openapi_key
-).bind(
-    function_call={
-        "name": "create_quiz",
-    },
-    functions=[
-        function,
-    ],
-)
+llm = make_quiz_llm(openapi_key)
+
 
-def format_docs(docs):
-    return "\n\n".join(document.page_content for document in docs)
- 
-    
 @st.cache_data(show_spinner="Loading file...")
 def split_file(file):
-    file_content = file.read()
-    file_path = f"./.cache/quiz_files/{file.name}"
-    with open(file_path, "wb") as f:
-        f.write(file_content)
-    splitter = CharacterTextSplitter.from_tiktoken_encoder(
-        separator="\n",
+    file_path = save_upload(file, f"./.cache/quiz_files/{file.name}")
+    splitter = FastTokenSplitter(
+        separators=["\n"],
         chunk_size=600,
         chunk_overlap=100,
     )
-    loader = UnstructuredFileLoader(file_path)
-    docs = loader.load_and_split(text_splitter=splitter)
+    progress = st.progress(0.0, text="Reading file...")
+    docs = ingest_file(
+        file_path,
+        splitter,
+        on_progress=lambda done, total: progress.progress(
+            done / total, text=f"Reading file... {done}/{total}"
+        ),
+    )
+    progress.empty()
     return docs
 
 
-questions_prompt = ChatPromptTemplate.from_messages(
-    [
-        (
-            "system",
-            """
-    You are a helpful assistant that is role playing as a teacher.
-
-    Based ONLY on the following context make 10 (TEN) questions to test the user's knowledge about the text.
-    The questions' difficulty should follow 'Difficulty' that has three types of easy, medium and hard.
-    Each question should have 4 answers, three of them must be incorrect and one should be correct.
-    Your turn!
-        
-    Difficulty: {difficulty}
-    Context: {context}
-""",
-        )
-    ]
-)
- 
-@st.cache_data(show_spinner="Making quiz...")
-def run_quiz_chain(_docs, topic, difficulty):
-    formatted_docs = format_docs(_docs)
-    chain = questions_prompt | llm 
-    if(_docs and difficulty):
-        return chain.invoke({"context": formatted_docs, "difficulty":difficulty})
+def run_quiz_chain(docs, topic, difficulty, alias=None):
+    # 파일 이름이 아니라 내용 해시로 찾으므로 같은 이름의 다른 파일에 예전 퀴즈가 나오지 않는다
+    store = get_quiz_store()
+    key = quiz_key(docs, difficulty, QUIZ_QUESTIONS, model_settings(llm))
+    quiz = store.get(key)
+    if quiz is None:
+        with st.spinner("Making quiz..."):
+            # 문서 전체를 한 프롬프트에 넣지 않고, 섹션별로 나눠 병렬로 만든 뒤 합친다
+            try:
+                quiz = generate_quiz(docs, difficulty, llm, QUIZ_QUESTIONS)
+            except Exception as e:
+                st.error(f"Could not make the quiz: {e}")
+                st.stop()
+        store.put(key, quiz, topic, difficulty)
+    if alias and quiz["questions"]:
+        store.put_alias(alias, key)
+    return quiz
+
+
+def wiki_topic_key(topic, difficulty):
+    return topic_key(topic, difficulty, QUIZ_QUESTIONS, model_settings(llm))
+
+def get_pooled_quiz(topic, difficulty):
+    # 같은 세션이 다시 실행될 때마다 새 퀴즈를 꺼내지 않도록 세션에 붙잡아 둔다
+    pool = get_quiz_pool()
+    if pool is None:
+        return None
+    key = f"pooled_quiz_{topic}_{difficulty}"
+    if key not in st.session_state:
+        pool.record_request(topic, difficulty)
+        st.session_state[key] = pool.take(topic, difficulty, pool_settings(llm, QUIZ_QUESTIONS))
+    return st.session_state[key]
+
 
 @st.cache_data(show_spinner="Searching Wikipedia...")
 def wiki_search(term):
@@ -141,12 +105,10 @@ with st.sidebar:
             docs = split_file(file)
     else:
         topic = st.text_input("Search Wikipedia...")
-        if topic:
-            docs = wiki_search(topic)
     
 
 
-if not docs:
+if not docs and not topic:
     st.markdown(
         """
     Welcome to QuizGPT.
@@ -161,9 +123,22 @@ else:
     if not openapi_key:
         st.error("Please enter your OpenAI API key to proceed.")
     else:
-        response = run_quiz_chain(docs, topic if topic else file.name, difficulty)
-        response = response.additional_kwargs["function_call"]["arguments"]
-        quiz_data = json.loads(response)
+        # 키를 확인한 뒤에만 풀에서 꺼낸다. 미리 만들어 둔 퀴즈가 있으면 위키피디아 검색도 건너뛴다
+        quiz_data = get_pooled_quiz(topic, difficulty) if topic else None
+        if quiz_data is None and topic:
+            # 재시작 뒤에도 같은 주제는 위키피디아를 다시 검색하지 않고 저장된 퀴즈를 쓴다
+            alias = wiki_topic_key(topic, difficulty)
+            quiz_data = get_quiz_store().get_alias(alias)
+            if quiz_data is None:
+                docs = wiki_search(topic)
+                quiz_data = run_quiz_chain(docs, topic, difficulty, alias)
+        elif quiz_data is None:
+            quiz_data = run_quiz_chain(docs, file.name, difficulty)
+        if len(quiz_data["questions"]) < QUIZ_QUESTIONS:
+            st.warning(
+                f"Only {len(quiz_data['questions'])} of {QUIZ_QUESTIONS} questions could be "
+                "made from this source. Try a longer document or another topic."
+            )
         with st.form("questions_form"): 
             answers = {}
             for i,question in enumerate(quiz_data["questions"]):
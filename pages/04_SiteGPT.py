@@ -1,19 +1,50 @@
 from langchain.document_loaders import SitemapLoader
 from langchain.schema.runnable import RunnableLambda, RunnablePassthrough
-from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain.vectorstores.faiss import FAISS
-from langchain.embeddings import OpenAIEmbeddings
 from langchain.chat_models import ChatOpenAI
 from langchain.prompts import ChatPromptTemplate
+from langchain.callbacks.base import BaseCallbackHandler
 import streamlit as st
+import asyncio
+import re
 import time 
+from utils.embeddings import get_cached_embeddings, get_embeddings, provider_path
+from utils.semantic_cache import get_semantic_cache
+from utils.site_index import (
+    INDEX_DIR,
+    MANIFEST_PATH,
+    manifest_version,
+    refresh_site_index,
+)
+from utils.hybrid_retriever import HybridRetriever
+from utils.llm_cache import use_llm_cache
+from utils.streaming import StreamingRenderer
+from utils.text_splitter import FastTokenSplitter
  
 
 st.set_page_config(
     page_title="SiteGPT",
     page_icon="🖥️",
 )
- 
+
+use_llm_cache("SiteGPT")
+
+
+class ChatCallbackHandler(BaseCallbackHandler):
+    message = ""
+
+    def on_llm_start(self, *args, **kwargs):
+        self.renderer = StreamingRenderer(escape=True)
+
+    def on_llm_end(self, response, *args, **kwargs):
+        self.message = self.renderer.finish(response.generations[0][0].text)
+
+    def on_llm_new_token(self, token, *args, **kwargs):
+        self.renderer.append(token)
+
+
+MAP_CONCURRENCY = 4
+MAP_TIMEOUT = 30
+
 openapi_key = st.sidebar.text_input("OpenAI API KEY : ")
 
 llm = ChatOpenAI(
@@ -21,6 +52,15 @@ llm = ChatOpenAI(
     openai_api_key=openapi_key,
 )
 
+choose_llm = ChatOpenAI(
+    temperature=0.1,
+    streaming=True,
+    callbacks=[
+        ChatCallbackHandler(),
+    ],
+    openai_api_key=openapi_key,
+)
+
 answers_prompt = ChatPromptTemplate.from_template(
     """
     Using ONLY the following context answer the user's question. If you can't just say you don't know, don't make anything up.
@@ -50,28 +90,73 @@ answers_prompt = ChatPromptTemplate.from_template(
 )
 
 
+def parse_score(answer):
+    scores = re.findall(r"Score:\s*(\d+(?:\.\d+)?)", answer)
+    if not scores:
+        return None
+    return float(scores[-1])
+
+
+async def answer_docs(docs, question, on_answer=None):
+    answers_chain = answers_prompt | llm
+    semaphore = asyncio.Semaphore(MAP_CONCURRENCY)
+
+    async def answer(i, doc):
+        # 한 문서의 호출이 실패해도 (타임아웃, API 오류 등) 그 문서만 건너뛰고 나머지 답으로 계속한다
+        source = doc.metadata.get("source")
+        async with semaphore:
+            try:
+                result = await asyncio.wait_for(
+                    answers_chain.ainvoke(
+                        {"question": question, "context": doc.page_content}
+                    ),
+                    timeout=MAP_TIMEOUT,
+                )
+            except asyncio.TimeoutError:
+                print(f"Timed out answering from {source}")
+                return i, None
+            except Exception as e:
+                print(f"Could not answer from {source}: {e!r}")
+                return i, None
+        # 사이트맵에 lastmod 가 없는 페이지도 색인하므로 날짜는 없을 수 있다
+        return i, {
+            "answer": result.content,
+            "score": parse_score(result.content),
+            "source": source,
+            "date": doc.metadata.get("lastmod", "unknown"),
+        }
+
+    # 도착하는 대로 알려주고, 결과는 검색 순서대로 돌려준다
+    answers = [None] * len(docs)
+    for next_answer in asyncio.as_completed(
+        [answer(i, doc) for i, doc in enumerate(docs)]
+    ):
+        i, result = await next_answer
+        if result is None:
+            continue
+        answers[i] = result
+        if on_answer:
+            on_answer(result)
+    return [answer for answer in answers if answer is not None]
+
+
 def get_answers(inputs):
     docs = inputs["docs"]
     question = inputs["question"]
-    answers_chain = answers_prompt | llm
-    # answers = []
-    # for doc in docs:
-    #     result = answers_chain.invoke(
-    #         {"question": question, "context": doc.page_content}
-    #     )
-    #     answers.append(result.content)
+    with st.status("Reading the documents...") as status:
+        answers = asyncio.run(
+            answer_docs(
+                docs,
+                question,
+                on_answer=lambda answer: status.write(
+                    f"Score {answer['score']} - {answer['source']}"
+                ),
+            )
+        )
+        status.update(label=f"Read {len(answers)} documents", state="complete")
     return {
         "question": question,
-        "answers": [
-            {
-                "answer": answers_chain.invoke(
-                    {"question": question, "context": doc.page_content}
-                ).content,
-                "source": doc.metadata["source"],
-                "date": doc.metadata["lastmod"],
-            }
-            for doc in docs
-        ],
+        "answers": answers,
     }
 
 
@@ -95,9 +180,13 @@ choose_prompt = ChatPromptTemplate.from_messages(
 
 
 def choose_answer(inputs):
-    answers = inputs["answers"]
+    # 점수 0 인 답은 reduce 프롬프트에 넣지 않는다
+    answers = [answer for answer in inputs["answers"] if answer["score"] != 0]
     question = inputs["question"]
-    choose_chain = choose_prompt | llm
+    if not answers:
+        st.markdown("I couldn't find the answer in the website.")
+        return None
+    choose_chain = choose_prompt | choose_llm
     condensed = "\n\n".join(
         f"{answer['answer']}\nSource:{answer['source']}\nDate:{answer['date']}\n"
         for answer in answers
@@ -125,11 +214,12 @@ def parse_page(soup):
     )
         
 
-@st.cache_data(show_spinner="Loading website...")
+@st.cache_resource(show_spinner="Loading website...")
 def load_website(url):
     filter_exp = ["^https://developers\.cloudflare\.com/(ai-gateway/|vectorize/|workers-ai/).*"]
     
-    splitter = RecursiveCharacterTextSplitter.from_tiktoken_encoder(
+    splitter = FastTokenSplitter(
+        recursive=True,
         chunk_size=1000,
         chunk_overlap=200,
     )
@@ -139,9 +229,14 @@ def load_website(url):
         parsing_function=parse_page,
     )
     loader.requests_per_second = 2
-    docs = loader.load_and_split(text_splitter=splitter) 
-    vector_store = FAISS.from_documents(docs, OpenAIEmbeddings())
-    return vector_store.as_retriever()
+    vector_store = refresh_site_index(
+        loader,
+        splitter,
+        get_cached_embeddings("site"),
+        index_dir=provider_path(INDEX_DIR),
+        manifest_path=provider_path(MANIFEST_PATH),
+    )
+    return HybridRetriever.from_vectorstore(vector_store)
 
 
 st.title("SiteGPT (Assignment)")
@@ -173,19 +268,33 @@ st.markdown(
 """
 )
 
+with st.sidebar:
+    if st.button("Refresh website index"):
+        load_website.clear()
+
 if openapi_key:  
     retriever = load_website("https://developers.cloudflare.com/sitemap-0.xml")
     query = st.text_input("Ask a question to the website.")
+    semantic_cache = get_semantic_cache(
+        provider_path("site"),
+        get_embeddings(),
+        version=manifest_version(provider_path(MANIFEST_PATH)),
+    )
     if query:
-        chain = (
-            {
-                "docs": retriever,
-                "question": RunnablePassthrough(),
-            }
-            | RunnableLambda(get_answers)
-            | RunnableLambda(choose_answer)
-        )
-        result = chain.invoke(query)
-        st.markdown(result.content.replace("$", "\$")) 
+        cached_answer = semantic_cache.lookup(query)
+        if cached_answer:
+            st.markdown(cached_answer.replace("$", "\$"))
+        else:
+            chain = (
+                {
+                    "docs": retriever,
+                    "question": RunnablePassthrough(),
+                }
+                | RunnableLambda(get_answers)
+                | RunnableLambda(choose_answer)
+            )
+            result = chain.invoke(query)
+            if result:
+                semantic_cache.update(query, result.content)
  
 
@@ -1,31 +1,17 @@
-import json
 import streamlit as st
-from langchain.utilities import DuckDuckGoSearchAPIWrapper
-from typing_extensions import override
-from openai import AssistantEventHandler
 import openai as client
-import yfinance
+from utils.assistants import (
+    get_assistant_id,
+    get_history,
+    mark_history_stale,
+    run_assistant,
+)
+from utils.finance_data import get_dataset
+from utils.search import get_search_client
+from utils.tool_output import serialize_tool_output
 
 ASSISTANT_NAME = "Investor Assistant"
 
-class EventHandler(AssistantEventHandler):
-
-    message = ""
-
-    @override
-    def on_text_created(self, text) -> None:
-        self.message_box = st.empty()
-
-    def on_text_delta(self, delta, snapshot):
-        self.message += delta.value
-        self.message_box.markdown(self.message.replace("$", "\$"))
-
-    def on_event(self, event):
-        print(event.event)
-        if event.event == "thread.run.requires_action":
-            submit_tool_outputs(event.data.id, event.data.thread_id)
-
-
 st.set_page_config(
     page_title="Investor Assistant GPT",
     page_icon="",
@@ -44,27 +30,23 @@ st.markdown(
 
 # Tools
 def get_ticker(inputs):
-    ddg = DuckDuckGoSearchAPIWrapper()
     company_name = inputs["company_name"]
-    return ddg.run(f"Ticker symbol of {company_name}")
+    return get_search_client().get_ticker(company_name)
 
 
 def get_income_statement(inputs):
     ticker = inputs["ticker"]
-    stock = yfinance.Ticker(ticker)
-    return json.dumps(stock.income_stmt.to_json())
+    return serialize_tool_output(get_dataset(ticker, "income_stmt"), "income_stmt")
 
 
 def get_balance_sheet(inputs):
     ticker = inputs["ticker"]
-    stock = yfinance.Ticker(ticker)
-    return json.dumps(stock.balance_sheet.to_json())
+    return serialize_tool_output(get_dataset(ticker, "balance_sheet"), "balance_sheet")
 
 
 def get_daily_stock_performance(inputs):
     ticker = inputs["ticker"]
-    stock = yfinance.Ticker(ticker)
-    return json.dumps(stock.history(period="3mo").to_json())
+    return serialize_tool_output(get_dataset(ticker, "history_3mo"), "history_3mo")
 
 
 functions_map = {
@@ -147,13 +129,6 @@ functions = [
 
 
 #### Utilities
-def get_run(run_id, thread_id):
-    return client.beta.threads.runs.retrieve(
-        run_id=run_id,
-        thread_id=thread_id,
-    )
-
-
 def send_message(thread_id, content):
     return client.beta.threads.messages.create(
         thread_id=thread_id,
@@ -162,51 +137,16 @@ def send_message(thread_id, content):
     )
 
 
-def get_messages(thread_id):
-    messages = client.beta.threads.messages.list(thread_id=thread_id)
-    messages = list(messages)
-    messages.reverse()
-    return messages
-
-
-def get_tool_outputs(run_id, thread_id):
-    run = get_run(run_id, thread_id)
-    outputs = []
-    for action in run.required_action.submit_tool_outputs.tool_calls:
-        action_id = action.id
-        function = action.function
-        print(f"Calling function: {function.name} with arg {function.arguments}")
-        outputs.append(
-            {
-                "output": functions_map[function.name](json.loads(function.arguments)),
-                "tool_call_id": action_id,
-            }
-        )
-    return outputs
-
-
-def submit_tool_outputs(run_id, thread_id):
-    outputs = get_tool_outputs(run_id, thread_id)
-    with client.beta.threads.runs.submit_tool_outputs_stream(
-        run_id=run_id,
-        thread_id=thread_id,
-        tool_outputs=outputs,
-        event_handler=EventHandler(),
-    ) as stream:
-        stream.until_done()
-
-
 def insert_message(message, role):
     with st.chat_message(role):
         st.markdown(message)
 
 
 def paint_history(thread_id):
-    messages = get_messages(thread_id)
-    for message in messages:
+    for message in get_history(thread_id):
         insert_message(
-            message.content[0].text.value,
-            message.role,
+            message["message"],
+            message["role"],
         )
 
 
@@ -214,25 +154,19 @@ openapi_key = st.sidebar.text_input("OpenAI API KEY : ")
 if not openapi_key:
     st.error("Please enter your OpenAI API key to proceed.")
 else:
-    if "assistant" not in st.session_state:
+    if "assistant_id" not in st.session_state:
         client.api_key = openapi_key
-        assistants = client.beta.assistants.list(limit=10)
-        for a in assistants:
-            if a.name == ASSISTANT_NAME:
-                assistant = client.beta.assistants.retrieve(a.id)
-                break
-        else:
-            assistant = client.beta.assistants.create(
-                name=ASSISTANT_NAME,
-                instructions="You help users do research on the given query using search engines. You give users the summarization of the information you got.",
-                model="gpt-4o-mini",
-                tools=functions,
-            )
+        assistant_id = get_assistant_id(
+            ASSISTANT_NAME,
+            instructions="You help users do research on the given query using search engines. You give users the summarization of the information you got.",
+            model="gpt-4o-mini",
+            tools=functions,
+        )
         thread = client.beta.threads.create()
-        st.session_state["assistant"] = assistant
+        st.session_state["assistant_id"] = assistant_id
         st.session_state["thread"] = thread
     else:
-        assistant = st.session_state["assistant"]
+        assistant_id = st.session_state["assistant_id"]
         thread = st.session_state["thread"]
 
     paint_history(thread.id)
@@ -240,12 +174,8 @@ else:
     if content:
         with st.spinner('Researching...'):
             send_message(thread.id, content)
+            mark_history_stale(thread.id)
             insert_message(content, "user")
 
         with st.chat_message("assistant"):
-            with client.beta.threads.runs.stream(
-                thread_id=thread.id,
-                assistant_id=assistant.id,
-                event_handler=EventHandler(),
-            ) as stream:
-                stream.until_done()
\ No newline at end of file
+            run_assistant(thread.id, assistant_id, functions_map)
\ No newline at end of file
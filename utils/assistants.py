@@ -0,0 +1,286 @@
+import asyncio
+import hashlib
+import json
+import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import openai as client
+import streamlit as st
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+
+from utils.streaming import StreamingRenderer
+
+TOOL_TIMEOUT = 60
+MAX_TOOL_WORKERS = 8
+REGISTRY_PATH = "./.cache/assistants.json"
+RUN_FAILURES = ("thread.run.failed", "thread.run.expired", "thread.run.cancelled")
+
+_registry_lock = threading.Lock()
+_verified = set()
+
+
+def call_function(functions_map, function):
+    print(f"Calling function: {function.name} with arg {function.arguments}")
+    return functions_map[function.name](json.loads(function.arguments))
+
+
+def run_tool_calls(tool_calls, functions_map, timeout=TOOL_TIMEOUT, ctx=None):
+    # 한 번의 requires_action 에 들어온 도구 호출을 동시에 실행한다.
+    # 도구마다 실행을 시작한 때부터 timeout 초를 따로 준다 (워커를 기다리는 시간도 timeout 까지).
+    # 시간을 넘긴 도구의 스레드는 멈출 수 없어 끝까지 돌지만 (스크립트 컨텍스트도 붙은 채로)
+    # 그 결과는 버리고 Error 출력을 제출한다
+    ctx = ctx or get_script_run_ctx()
+    executor = ThreadPoolExecutor(
+        max_workers=max(1, min(MAX_TOOL_WORKERS, len(tool_calls))),
+        initializer=lambda: add_script_run_ctx(None, ctx),
+    )
+    submitted_at = time.monotonic()
+    started_at = {}
+
+    def call(i, function):
+        started_at[i] = time.monotonic()
+        return call_function(functions_map, function)
+
+    futures = [
+        executor.submit(call, i, action.function) for i, action in enumerate(tool_calls)
+    ]
+    pending = set(range(len(futures)))
+    timed_out = set()
+    while pending:
+        now = time.monotonic()
+        deadlines = {}
+        for i in list(pending):
+            deadline = started_at.get(i, submitted_at) + timeout
+            if futures[i].done():
+                pending.discard(i)
+            elif now >= deadline:
+                pending.discard(i)
+                timed_out.add(i)
+            else:
+                deadlines[i] = deadline
+        if pending:
+            wait(
+                [futures[i] for i in pending],
+                timeout=min(deadlines.values()) - now,
+                return_when=FIRST_COMPLETED,
+            )
+    executor.shutdown(wait=False, cancel_futures=True)
+    outputs = []
+    for i, (action, future) in enumerate(zip(tool_calls, futures)):
+        if i in timed_out:
+            output = f"Error: {action.function.name} timed out after {timeout}s"
+        elif future.exception() is not None:
+            output = f"Error: {action.function.name} failed: {future.exception()}"
+        else:
+            output = future.result()
+        print(f"Finished function: {action.function.name}")
+        outputs.append(
+            {
+                "output": output,
+                "tool_call_id": action.id,
+            }
+        )
+    return outputs
+
+
+def run_failure_message(run):
+    error = getattr(run, "last_error", None)
+    if error is not None:
+        return f"The assistant run {run.status}: {error.message}"
+    return f"The assistant run {run.status}. Please try again."
+
+
+async def drive_run(thread_id, assistant_id, functions_map):
+    # 스트림 안에서 스트림을 여는 대신, 스트림 -> 도구 실행 -> 제출 -> 스트림 순서로 돈다
+    ctx = get_script_run_ctx()
+    phase = "request"
+    timings = []
+    renderer = None
+    # AsyncOpenAI 의 httpx 풀은 asyncio.run 의 이벤트 루프에 묶여 있어 실행 사이에 재사용할 수 없다.
+    # 대신 예외가 나도 닫히도록 async with 로 연다
+    async with client.AsyncOpenAI(
+        api_key=client.api_key,
+        organization=client.organization,
+        base_url=client.base_url,
+    ) as async_client:
+        manager = async_client.beta.threads.runs.stream(
+            thread_id=thread_id,
+            assistant_id=assistant_id,
+        )
+        while manager is not None:
+            opened_at = time.perf_counter()
+            first_event_at = None
+            required_run = None
+            failed_run = None
+            async with manager as stream:
+                async for event in stream:
+                    now = time.perf_counter()
+                    if first_event_at is None:
+                        first_event_at = now
+                        timings.append((phase, now - opened_at))
+                    if event.event == "thread.message.created":
+                        timings.append(("thinking", now - first_event_at))
+                        renderer = StreamingRenderer(escape=True)
+                    elif event.event == "thread.message.delta":
+                        for content in event.data.delta.content or []:
+                            if content.type == "text" and content.text and content.text.value:
+                                renderer.append(content.text.value)
+                    elif event.event == "thread.message.completed":
+                        renderer.finish()
+                    elif event.event == "thread.run.requires_action":
+                        timings.append(("thinking", now - first_event_at))
+                        required_run = event.data
+                    elif event.event in RUN_FAILURES:
+                        failed_run = event.data
+            if renderer is not None and renderer.pending:
+                renderer.finish()
+            manager = None
+            if failed_run is not None:
+                print(f"Run {failed_run.id} ended with {failed_run.status}")
+                st.error(run_failure_message(failed_run))
+            elif required_run is not None:
+                started = time.perf_counter()
+                outputs = await asyncio.to_thread(
+                    run_tool_calls,
+                    required_run.required_action.submit_tool_outputs.tool_calls,
+                    functions_map,
+                    ctx=ctx,
+                )
+                timings.append(("tools", time.perf_counter() - started))
+                manager = async_client.beta.threads.runs.submit_tool_outputs_stream(
+                    thread_id=thread_id,
+                    run_id=required_run.id,
+                    tool_outputs=outputs,
+                )
+                phase = "submit"
+    # 다른 로그처럼 print 로 남긴다 (logging INFO 는 Streamlit 기본 설정에서 보이지 않는다)
+    print("Run timings: " + ", ".join(f"{name} {seconds:.2f}s" for name, seconds in timings))
+    return timings
+
+
+def run_assistant(thread_id, assistant_id, functions_map):
+    return asyncio.run(drive_run(thread_id, assistant_id, functions_map))
+
+
+def get_history(thread_id):
+    # 세션에 받아 둔 메시지 뒤로 새로 생긴 메시지만 after 커서로 가져온다
+    key = f"history_{thread_id}"
+    if key not in st.session_state:
+        st.session_state[key] = {"messages": [], "last_id": None, "stale": True}
+    history = st.session_state[key]
+    # 새 메시지를 보내거나 실행이 끝난 뒤에만 서버에 묻는다
+    if not history["stale"]:
+        return history["messages"]
+    params = {"thread_id": thread_id, "order": "asc"}
+    if history["last_id"]:
+        params["after"] = history["last_id"]
+    for message in client.beta.threads.messages.list(**params):
+        if getattr(message, "status", "completed") == "in_progress":
+            break
+        history["messages"].append(
+            {
+                "message": message.content[0].text.value,
+                "role": message.role,
+            }
+        )
+        history["last_id"] = message.id
+    else:
+        history["stale"] = False
+    return history["messages"]
+
+
+def mark_history_stale(thread_id):
+    key = f"history_{thread_id}"
+    if key in st.session_state:
+        st.session_state[key]["stale"] = True
+
+
+def tools_hash(tools):
+    schema = json.dumps(tools, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(schema.encode("utf-8")).hexdigest()[:16]
+
+
+def _load_registry():
+    if not os.path.isfile(REGISTRY_PATH):
+        return {}
+    with open(REGISTRY_PATH, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _save_registry(registry):
+    tmp_path = f"{REGISTRY_PATH}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(registry, f, indent=2)
+    os.replace(tmp_path, REGISTRY_PATH)
+
+
+def account_hash(api_key, organization=None):
+    # 어시스턴트는 키/조직마다 따로 보이므로 레지스트리도 계정별로 나눈다
+    raw = f"{organization or ''}\0{api_key or ''}"
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()[:16]
+
+
+def _account_client(api_key, organization):
+    return client.OpenAI(api_key=api_key, organization=organization, base_url=client.base_url)
+
+
+def _resolve_assistant(api, key, name, instructions, model, tools):
+    with _registry_lock:
+        registry = _load_registry()
+        if key in registry:
+            return registry[key]
+        # 레지스트리가 없을 때만 전체 목록을 훑어서 같은 스키마의 어시스턴트를 재사용한다
+        schema_hash = tools_hash(tools)
+        for assistant in api.beta.assistants.list(limit=100):
+            metadata = assistant.metadata or {}
+            if assistant.name == name and metadata.get("tools_hash") == schema_hash:
+                break
+        else:
+            assistant = api.beta.assistants.create(
+                name=name,
+                instructions=instructions,
+                model=model,
+                tools=tools,
+                metadata={"tools_hash": schema_hash},
+            )
+        registry[key] = assistant.id
+        _save_registry(registry)
+        return assistant.id
+
+
+def _verify_assistant(api, key, assistant_id, name, instructions, model, tools):
+    # 전역 client.api_key 는 다른 세션이 바꿀 수 있으므로 이 계정의 클라이언트로만 확인한다
+    try:
+        api.beta.assistants.retrieve(assistant_id)
+    except client.NotFoundError:
+        print(f"Assistant {assistant_id} is gone, creating it again")
+        with _registry_lock:
+            registry = _load_registry()
+            # 이 계정 키에 이 id 가 그대로 있을 때만 지운다
+            if registry.get(key) == assistant_id:
+                del registry[key]
+                _save_registry(registry)
+        _resolve_assistant(api, key, name, instructions, model, tools)
+    except Exception as e:
+        print(f"Could not verify assistant {assistant_id}: {e}")
+
+
+def get_assistant_id(name, instructions, model, tools):
+    api = _account_client(client.api_key, client.organization)
+    key = f"{name}:{tools_hash(tools)}:{account_hash(client.api_key, client.organization)}"
+    assistant_id = _load_registry().get(key)
+    if assistant_id is None:
+        return _resolve_assistant(api, key, name, instructions, model, tools)
+    # 세션 시작을 막지 않도록 존재 여부는 프로세스마다 한 번, 백그라운드에서 확인한다
+    with _registry_lock:
+        verify = key not in _verified
+        _verified.add(key)
+    if verify:
+        threading.Thread(
+            target=_verify_assistant,
+            args=(api, key, assistant_id, name, instructions, model, tools),
+            daemon=True,
+        ).start()
+    return assistant_id
@@ -0,0 +1,18 @@
+import sqlite3
+import threading
+
+_local = threading.local()
+
+
+def get_connection(path):
+    # sqlite 연결은 스레드마다 따로 만들고, WAL 로 여러 세션이 동시에 읽을 수 있게 한다
+    connections = getattr(_local, "connections", None)
+    if connections is None:
+        connections = _local.connections = {}
+    connection = connections.get(path)
+    if connection is None:
+        connection = sqlite3.connect(path, timeout=30, isolation_level=None)
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+        connections[path] = connection
+    return connection
@@ -0,0 +1,104 @@
+import hashlib
+import math
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from functools import lru_cache
+
+import tiktoken
+from langchain.embeddings import OpenAIEmbeddings
+
+MAX_BATCH_TOKENS = 50_000
+MAX_BATCH_SIZE = 1000
+MAX_CONCURRENCY = 4
+MAX_RETRIES = 6
+CHARS_PER_TOKEN = 3
+
+
+# 바이트 하나가 토큰 하나인 인코딩. BPE 파일을 받을 필요가 없어 로컬 임베딩(오프라인 CI)에서 쓴다
+OFFLINE_ENCODING = "bytes"
+GPT2_PATTERN = r"""'(?:[sdmt]|ll|ve|re)| ?\p{L}+| ?\p{N}+| ?[^\s\p{L}\p{N}]+|\s+(?!\S)|\s+"""
+
+
+@lru_cache(maxsize=None)
+def get_encoding(name="cl100k_base"):
+    if name == OFFLINE_ENCODING:
+        return tiktoken.Encoding(
+            name=OFFLINE_ENCODING,
+            pat_str=GPT2_PATTERN,
+            mergeable_ranks={bytes([i]): i for i in range(256)},
+            special_tokens={},
+        )
+    return tiktoken.get_encoding(name)
+
+
+def is_rate_limit_error(error):
+    return "RateLimit" in type(error).__name__ or getattr(error, "status_code", None) == 429
+
+
+def embed_with_backoff(embeddings, texts):
+    for attempt in range(MAX_RETRIES):
+        try:
+            return embeddings.embed_documents(texts)
+        except Exception as e:
+            if not is_rate_limit_error(e) or attempt == MAX_RETRIES - 1:
+                raise
+            delay = min(60, 2**attempt) + random.random()
+            print(f"Embedding rate limited, retrying in {delay:.1f}s")
+            time.sleep(delay)
+
+
+def estimate_tokens(texts, exact=True):
+    # 토큰 한도는 OpenAI API 에만 있다. 로컬 임베딩은 BPE 파일을 받지 않도록 글자 수로 어림한다
+    if exact:
+        return [len(tokens) for tokens in get_encoding().encode_ordinary_batch(texts)]
+    return [math.ceil(len(text) / CHARS_PER_TOKEN) for text in texts]
+
+
+def pack_batches(texts, exact=True):
+    batches = []
+    batch = []
+    batch_tokens = 0
+    token_counts = estimate_tokens(texts, exact)
+    for text, tokens in zip(texts, token_counts):
+        if batch and (
+            batch_tokens + tokens > MAX_BATCH_TOKENS or len(batch) >= MAX_BATCH_SIZE
+        ):
+            batches.append(batch)
+            batch = []
+            batch_tokens = 0
+        batch.append(text)
+        batch_tokens += tokens
+    if batch:
+        batches.append(batch)
+    return batches
+
+
+def embed_texts(texts, cached_embeddings, max_concurrency=MAX_CONCURRENCY):
+    # 같은 내용의 청크(문서마다 반복되는 머리말 등)는 한 번만 임베딩한다
+    unique = {}
+    for text in texts:
+        unique.setdefault(hashlib.sha256(text.encode("utf-8")).hexdigest(), text)
+    unique_texts = list(unique.values())
+
+    store = cached_embeddings.document_embedding_store
+    vectors = dict(zip(unique_texts, store.mget(unique_texts)))
+    missing = [text for text, vector in vectors.items() if vector is None]
+    print(
+        f"Embedding {len(texts)} chunks: {len(unique_texts)} unique, "
+        f"{len(missing)} not cached"
+    )
+    if missing:
+        underlying = cached_embeddings.underlying_embeddings
+        batches = pack_batches(missing, exact=isinstance(underlying, OpenAIEmbeddings))
+        with ThreadPoolExecutor(max_workers=max_concurrency) as executor:
+            futures = {
+                executor.submit(embed_with_backoff, underlying, batch): batch
+                for batch in batches
+            }
+            for future in as_completed(futures):
+                batch = futures[future]
+                batch_vectors = future.result()
+                store.mset(list(zip(batch, batch_vectors)))
+                vectors.update(zip(batch, batch_vectors))
+    return [vectors[text] for text in texts]
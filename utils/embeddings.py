@@ -0,0 +1,81 @@
+import hashlib
+import os
+import re
+from functools import lru_cache
+
+import numpy as np
+from langchain.embeddings import CacheBackedEmbeddings, OpenAIEmbeddings
+from langchain.embeddings.base import Embeddings
+from langchain.storage import LocalFileStore
+
+from utils.embedding_pipeline import OFFLINE_ENCODING
+
+# "openai" 또는 "hashing" (네트워크 없이 동작하는 결정적 로컬 임베딩)
+EMBEDDINGS_PROVIDER = os.environ.get("EMBEDDINGS_PROVIDER", "openai")
+HASHING_DIMENSIONS = 384
+
+TOKEN_RE = re.compile(r"\w+")
+
+
+@lru_cache(maxsize=100_000)
+def _feature_hash(feature):
+    digest = int.from_bytes(
+        hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest(), "little"
+    )
+    return digest >> 1, 1.0 if digest & 1 else -1.0
+
+
+class HashingEmbeddings(Embeddings):
+    def __init__(self, dimensions=HASHING_DIMENSIONS):
+        self.dimensions = dimensions
+
+    def embed_array(self, texts):
+        matrix = np.zeros((len(texts), self.dimensions), dtype=np.float32)
+        for row, text in enumerate(texts):
+            tokens = TOKEN_RE.findall(text.lower())
+            features = tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+            if not features:
+                continue
+            hashes = [_feature_hash(feature) for feature in features]
+            columns = np.fromiter((h for h, _ in hashes), dtype=np.uint64, count=len(hashes))
+            signs = np.fromiter((s for _, s in hashes), dtype=np.float32, count=len(hashes))
+            np.add.at(matrix[row], (columns % self.dimensions).astype(np.intp), signs)
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return matrix / norms
+
+    def embed_documents(self, texts):
+        return self.embed_array(texts).tolist()
+
+    def embed_query(self, text):
+        return self.embed_array([text])[0].tolist()
+
+
+def get_embeddings(provider=None):
+    provider = provider or EMBEDDINGS_PROVIDER
+    if provider == "openai":
+        return OpenAIEmbeddings()
+    if provider == "hashing":
+        return HashingEmbeddings()
+    raise ValueError(f"Unknown embeddings provider: {provider}")
+
+
+def splitter_encoding(provider=None):
+    # 로컬 임베딩은 네트워크 없이 돌아야 하므로 gpt2 BPE 대신 바이트 인코딩으로 길이를 센다
+    # (청크 크기가 토큰이 아니라 UTF-8 바이트 기준이 된다)
+    provider = provider or EMBEDDINGS_PROVIDER
+    return "gpt2" if provider == "openai" else OFFLINE_ENCODING
+
+
+def provider_path(path, provider=None):
+    # 제공자마다 벡터 차원이 다르므로 인덱스/캐시 경로를 나눈다 (openai 는 기존 경로 그대로)
+    provider = provider or EMBEDDINGS_PROVIDER
+    if provider == "openai":
+        return path
+    root, extension = os.path.splitext(path)
+    return f"{root}-{provider}{extension}"
+
+
+def get_cached_embeddings(name, provider=None):
+    store = LocalFileStore(provider_path(f"./.cache/embeddings/{name}", provider))
+    return CacheBackedEmbeddings.from_bytes_store(get_embeddings(provider), store)
@@ -0,0 +1,136 @@
+import math
+import os
+import pickle
+import shutil
+import uuid
+
+import numpy as np
+from langchain.docstore.in_memory import InMemoryDocstore
+from langchain.vectorstores.faiss import FAISS, dependable_faiss_import
+
+from utils.embedding_pipeline import embed_texts
+
+INDEX_FILE = "index.faiss"
+DOCSTORE_FILE = "index.pkl"
+
+# auto | flat | ivf | hnsw | ivfpq
+INDEX_MODE = os.environ.get("FAISS_INDEX_MODE", "auto")
+TRAIN_SAMPLE_SIZE = 50_000
+HNSW_NEIGHBORS = 32
+
+
+def index_exists(path):
+    return os.path.isfile(os.path.join(path, INDEX_FILE)) and os.path.isfile(
+        os.path.join(path, DOCSTORE_FILE)
+    )
+
+
+def save_index(vectorstore, path):
+    # 다른 세션이 반쯤 쓰인 인덱스를 읽지 않도록 임시 폴더에 저장한 뒤 교체
+    tmp_path = f"{path}.tmp-{uuid.uuid4().hex}"
+    vectorstore.save_local(tmp_path)
+    if os.path.isdir(path):
+        shutil.rmtree(path, ignore_errors=True)
+    try:
+        os.replace(tmp_path, path)
+    except OSError:
+        shutil.rmtree(tmp_path, ignore_errors=True)
+
+
+def load_index(path, embeddings, mmap=True):
+    faiss = dependable_faiss_import()
+    index_path = os.path.join(path, INDEX_FILE)
+    try:
+        index = faiss.read_index(index_path, faiss.IO_FLAG_MMAP if mmap else 0)
+    except RuntimeError:
+        index = faiss.read_index(index_path)
+    with open(os.path.join(path, DOCSTORE_FILE), "rb") as f:
+        docstore, index_to_docstore_id = pickle.load(f)
+    return FAISS(embeddings, index, docstore, index_to_docstore_id)
+
+
+def choose_index_mode(count):
+    if count < 10_000:
+        return "flat"
+    if count < 100_000:
+        return "hnsw"
+    if count < 1_000_000:
+        return "ivf"
+    return "ivfpq"
+
+
+def make_index(vectors, mode=None):
+    faiss = dependable_faiss_import()
+    mode = mode or INDEX_MODE
+    if mode == "auto":
+        mode = choose_index_mode(len(vectors))
+    dimensions = vectors.shape[1]
+    if mode == "flat":
+        return faiss.IndexFlatL2(dimensions)
+    if mode == "hnsw":
+        index = faiss.IndexHNSWFlat(dimensions, HNSW_NEIGHBORS)
+        index.hnsw.efConstruction = 80
+        index.hnsw.efSearch = 64
+        return index
+    # IVF 는 리스트마다 최소 39개 정도의 학습 벡터가 필요하다
+    nlist = max(1, min(int(4 * math.sqrt(len(vectors))), len(vectors) // 39))
+    quantizer = faiss.IndexFlatL2(dimensions)
+    if mode == "ivf":
+        index = faiss.IndexIVFFlat(quantizer, dimensions, nlist)
+    elif mode == "ivfpq" and len(vectors) < 256 * 39:
+        # PQ 코드북(2^8)을 학습할 벡터가 부족하면 IVF 로 대신한다
+        index = faiss.IndexIVFFlat(quantizer, dimensions, nlist)
+    elif mode == "ivfpq":
+        subquantizers = max(m for m in range(1, 65) if dimensions % m == 0)
+        index = faiss.IndexIVFPQ(quantizer, dimensions, nlist, subquantizers, 8)
+    else:
+        raise ValueError(f"Unknown index mode: {mode}")
+    sample = vectors
+    if len(vectors) > TRAIN_SAMPLE_SIZE:
+        rows = np.random.default_rng(0).choice(len(vectors), TRAIN_SAMPLE_SIZE, replace=False)
+        sample = vectors[rows]
+    index.train(sample)
+    index.nprobe = max(1, nlist // 16)
+    return index
+
+
+def build_index(docs, cached_embeddings, ids=None, mode=None):
+    if not docs:
+        raise ValueError("No text could be extracted to build the index from.")
+    texts = [doc.page_content for doc in docs]
+    vectors = np.array(embed_texts(texts, cached_embeddings), dtype=np.float32)
+    ids = ids or [str(uuid.uuid4()) for _ in docs]
+    index = make_index(vectors, mode)
+    index.add(vectors)
+    return FAISS(
+        cached_embeddings,
+        index,
+        InMemoryDocstore(dict(zip(ids, docs))),
+        dict(enumerate(ids)),
+    )
+
+
+def delete_documents(vectorstore, ids, cached_embeddings):
+    try:
+        vectorstore.delete(ids)
+        return vectorstore
+    except RuntimeError:
+        # HNSW 처럼 remove_ids 를 지원하지 않는 인덱스는 남은 문서로 다시 만든다 (임베딩은 캐시에서 읽음)
+        deleted = set(ids)
+        remaining = [
+            id
+            for _, id in sorted(vectorstore.index_to_docstore_id.items())
+            if id not in deleted
+        ]
+        docs = [vectorstore.docstore.search(id) for id in remaining]
+        return build_index(docs, cached_embeddings, ids=remaining)
+
+
+def recall_at_k(vectors, queries, index, k=4):
+    faiss = dependable_faiss_import()
+    baseline = faiss.IndexFlatL2(vectors.shape[1])
+    baseline.add(vectors)
+    _, expected = baseline.search(queries, k)
+    _, found = index.search(queries, k)
+    hits = sum(len(set(e) & set(f)) for e, f in zip(expected, found))
+    return hits / (len(queries) * k)
@@ -0,0 +1,97 @@
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+
+import pandas as pd
+import yfinance
+
+CACHE_DIR = "./.cache/finance"
+DATASETS = {
+    "income_stmt": (60 * 60 * 24, lambda stock: stock.income_stmt),
+    "balance_sheet": (60 * 60 * 24, lambda stock: stock.balance_sheet),
+    "history_3mo": (60 * 15, lambda stock: stock.history(period="3mo")),
+}
+# 재무제표는 열이 날짜(Timestamp)라 parquet 에 그대로 못 쓰므로 전치해서 저장한다
+TRANSPOSED = {"income_stmt", "balance_sheet"}
+MAX_MEMORY_ENTRIES = 256
+
+# (종목, 데이터) -> (가져온 시각, DataFrame). 오래 안 쓴 것부터 MAX_MEMORY_ENTRIES 개만 남긴다
+_memory = OrderedDict()
+_inflight = {}
+_lock = threading.Lock()
+
+
+def _path(ticker, dataset):
+    return os.path.join(CACHE_DIR, re.sub(r"[^A-Z0-9.^=-]", "_", ticker), f"{dataset}.parquet")
+
+
+def _load_from_disk(ticker, dataset, ttl):
+    path = _path(ticker, dataset)
+    if not os.path.isfile(path):
+        return None, None
+    fetched_at = os.path.getmtime(path)
+    if time.time() - fetched_at >= ttl:
+        return None, None
+    df = pd.read_parquet(path)
+    return (df.T if dataset in TRANSPOSED else df), fetched_at
+
+
+def _save_to_disk(ticker, dataset, df):
+    path = _path(ticker, dataset)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    (df.T if dataset in TRANSPOSED else df).to_parquet(tmp_path)
+    os.replace(tmp_path, path)
+
+
+def _fetch(ticker, dataset):
+    # Ticker 는 재무제표를 객체 안에 기억해 두므로 재사용하면 TTL 이 지나도 예전 값이 나온다.
+    # 가져올 때마다 새로 만든다
+    stock = yfinance.Ticker(ticker)
+    print(f"Fetching {dataset} for {ticker}")
+    return DATASETS[dataset][1](stock)
+
+
+def get_dataset(ticker, dataset):
+    ticker = ticker.strip().upper()
+    key = (ticker, dataset)
+    ttl = DATASETS[dataset][0]
+    with _lock:
+        entry = _memory.get(key)
+        if entry and time.time() - entry[0] < ttl:
+            _memory.move_to_end(key)
+            return entry[1]
+        if entry:
+            del _memory[key]
+        # 같은 종목을 동시에 요청하면 한 번만 가져오고 나머지는 그 결과를 기다린다
+        future = _inflight.get(key)
+        leader = future is None
+        if leader:
+            future = _inflight[key] = Future()
+    if not leader:
+        return future.result()
+    try:
+        df, fetched_at = _load_from_disk(ticker, dataset, ttl)
+        if df is None:
+            df = _fetch(ticker, dataset)
+            fetched_at = time.time()
+            try:
+                _save_to_disk(ticker, dataset, df)
+            except Exception as e:
+                print(f"Could not persist {dataset} for {ticker}: {e}")
+        with _lock:
+            _memory[key] = (fetched_at, df)
+            _memory.move_to_end(key)
+            while len(_memory) > MAX_MEMORY_ENTRIES:
+                _memory.popitem(last=False)
+        future.set_result(df)
+        return df
+    except Exception as e:
+        future.set_exception(e)
+        raise
+    finally:
+        with _lock:
+            _inflight.pop(key, None)
@@ -0,0 +1,96 @@
+import math
+import re
+from collections import Counter, defaultdict
+from typing import Any, List
+
+import numpy as np
+from langchain.callbacks.manager import CallbackManagerForRetrieverRun
+from langchain.schema import BaseRetriever, Document
+
+HYBRID_K = 3
+CANDIDATES_K = 20
+RRF_K = 60
+# "llama-2-7b-chat-fp16", "1.5", "$0.19" 같은 값이 한 토큰으로 남도록 - . 로 이어진 단어를 묶는다
+TERM_RE = re.compile(r"\w+(?:[-.]\w+)*")
+
+
+def tokenize(text):
+    terms = []
+    for term in TERM_RE.findall(text.lower()):
+        terms.append(term)
+        parts = re.split(r"[-.]", term)
+        if len(parts) > 1:
+            terms.extend(part for part in parts if part)
+    return terms
+
+
+class BM25Index:
+    def __init__(self, texts, k1=1.5, b=0.75):
+        self.k1 = k1
+        self.b = b
+        self.postings = defaultdict(list)
+        self.lengths = []
+        for position, text in enumerate(texts):
+            terms = tokenize(text)
+            self.lengths.append(len(terms))
+            for term, count in Counter(terms).items():
+                self.postings[term].append((position, count))
+        self.average_length = sum(self.lengths) / len(self.lengths) if self.lengths else 0.0
+        total = len(self.lengths)
+        self.idf = {
+            term: math.log(1 + (total - len(posting) + 0.5) / (len(posting) + 0.5))
+            for term, posting in self.postings.items()
+        }
+
+    def search(self, query, k):
+        scores = defaultdict(float)
+        for term in set(tokenize(query)):
+            idf = self.idf.get(term)
+            if idf is None:
+                continue
+            for position, count in self.postings[term]:
+                norm = 1 - self.b + self.b * self.lengths[position] / self.average_length
+                scores[position] += idf * count * (self.k1 + 1) / (count + self.k1 * norm)
+        return sorted(scores.items(), key=lambda item: item[1], reverse=True)[:k]
+
+
+def reciprocal_rank_fusion(rankings, rrf_k=RRF_K):
+    scores = defaultdict(float)
+    for ranking in rankings:
+        for rank, key in enumerate(ranking):
+            scores[key] += 1 / (rrf_k + rank + 1)
+    return sorted(scores, key=scores.get, reverse=True)
+
+
+class HybridRetriever(BaseRetriever):
+    # FAISS 와 같은 docstore 위에 BM25 역색인을 두고 두 순위를 RRF 로 합친다
+    vectorstore: Any
+    bm25: Any
+    ids: List[str]
+    k: int = HYBRID_K
+    candidates_k: int = CANDIDATES_K
+
+    @classmethod
+    def from_vectorstore(cls, vectorstore, **kwargs):
+        # docstore 내부(_dict)를 보지 않고 FAISS 위치 순서의 id 목록으로 문서를 찾는다
+        ids = [id for _, id in sorted(vectorstore.index_to_docstore_id.items())]
+        texts = [vectorstore.docstore.search(id).page_content for id in ids]
+        return cls(vectorstore=vectorstore, bm25=BM25Index(texts), ids=ids, **kwargs)
+
+    def vector_ids(self, query):
+        embedding = np.array([self.vectorstore.embeddings.embed_query(query)], dtype=np.float32)
+        _, positions = self.vectorstore.index.search(embedding, self.candidates_k)
+        return [
+            self.vectorstore.index_to_docstore_id[position]
+            for position in positions[0]
+            if position != -1
+        ]
+
+    def keyword_ids(self, query):
+        return [self.ids[position] for position, _ in self.bm25.search(query, self.candidates_k)]
+
+    def _get_relevant_documents(
+        self, query: str, *, run_manager: CallbackManagerForRetrieverRun
+    ) -> List[Document]:
+        fused = reciprocal_rank_fusion([self.vector_ids(query), self.keyword_ids(query)])
+        return [self.vectorstore.docstore.search(id) for id in fused[: self.k]]
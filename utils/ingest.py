@@ -0,0 +1,222 @@
+import hashlib
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from langchain.document_loaders import UnstructuredFileLoader
+from langchain.schema import Document
+
+from utils.embedding_pipeline import embed_texts
+
+READ_CHUNK_BYTES = 1024 * 1024
+TEXT_SECTION_CHARS = 64 * 1024
+PDF_PAGES_PER_TASK = 8
+MAX_PARSE_WORKERS = max(1, min(4, (os.cpu_count() or 1) - 1))
+EMBED_BATCH_CHUNKS = 200
+
+
+def hash_upload(file):
+    # 업로드 전체를 한 번에 복사하지 않고 조각 단위로 해시한다
+    digest = hashlib.sha256()
+    file.seek(0)
+    for block in iter(lambda: file.read(READ_CHUNK_BYTES), b""):
+        digest.update(block)
+    file.seek(0)
+    return digest.hexdigest()
+
+
+def save_upload(file, path):
+    file.seek(0)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        for block in iter(lambda: file.read(READ_CHUNK_BYTES), b""):
+            f.write(block)
+    os.replace(tmp_path, path)
+    file.seek(0)
+    return path
+
+
+def _parse_pdf_pages(path, start, end):
+    # 프로세스 풀에서 실행되므로 Document 대신 (페이지, 텍스트) 만 돌려준다
+    from pypdf import PdfReader
+
+    reader = PdfReader(path)
+    return [(number, reader.pages[number].extract_text() or "") for number in range(start, end)]
+
+
+def _pdf_sections(path):
+    from pypdf import PdfReader
+
+    total = len(PdfReader(path).pages)
+    ranges = [
+        (start, min(start + PDF_PAGES_PER_TASK, total))
+        for start in range(0, total, PDF_PAGES_PER_TASK)
+    ]
+    if len(ranges) <= 1:
+        results = (_parse_pdf_pages(path, start, end) for start, end in ranges)
+        executor = None
+    else:
+        executor = ProcessPoolExecutor(
+            max_workers=min(MAX_PARSE_WORKERS, len(ranges)),
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+        # map 은 앞 구간을 기다리는 동안에도 뒤 구간을 계속 파싱한다
+        results = executor.map(
+            _parse_pdf_pages,
+            [path] * len(ranges),
+            [start for start, _ in ranges],
+            [end for _, end in ranges],
+        )
+    try:
+        for (_, end), pages in zip(ranges, results):
+            docs = [
+                Document(page_content=text, metadata={"source": path, "page": number})
+                for number, text in pages
+                if text.strip()
+            ]
+            yield end, total, docs
+    finally:
+        if executor is not None:
+            executor.shutdown(cancel_futures=True)
+
+
+def _is_page_break(paragraph):
+    for run in paragraph.runs:
+        for element in run._element:
+            if element.tag.endswith("}br") and element.get(
+                "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}type"
+            ) == "page":
+                return True
+            if element.tag.endswith("}lastRenderedPageBreak"):
+                return True
+    return False
+
+
+def _table_text(table):
+    rows = []
+    for row in table.rows:
+        cells = []
+        for cell in row.cells:
+            # 병합된 셀은 같은 셀이 여러 번 나오므로 한 번만 쓴다
+            text = cell.text.strip()
+            if text and (not cells or cells[-1] != text):
+                cells.append(text)
+        if cells:
+            rows.append(" | ".join(cells))
+    return "\n".join(rows)
+
+
+def _header_footer_text(document):
+    texts = []
+    for section in document.sections:
+        for part in (section.header, section.footer):
+            if part.is_linked_to_previous:
+                continue
+            for paragraph in part.paragraphs:
+                if paragraph.text.strip():
+                    texts.append(paragraph.text)
+            for table in part.tables:
+                texts.append(_table_text(table))
+    return [text for text in dict.fromkeys(texts) if text.strip()]
+
+
+def _docx_sections(path):
+    # DOCX 는 XML 한 덩어리라 페이지 단위로 나눠 파싱할 수 없다. 프로세스 풀 없이 한 번 읽고
+    # 본문(문단과 표를 문서 순서대로)을 페이지 나눔 기준으로 묶어 내보낸다
+    import docx
+    from docx.table import Table
+    from docx.text.paragraph import Paragraph
+
+    document = docx.Document(path)
+    pages = [[]]
+    for element in document.element.body.iterchildren():
+        if element.tag.endswith("}p"):
+            paragraph = Paragraph(element, document)
+            if _is_page_break(paragraph) and pages[-1]:
+                pages.append([])
+            if paragraph.text.strip():
+                pages[-1].append(paragraph.text)
+        elif element.tag.endswith("}tbl"):
+            text = _table_text(Table(element, document))
+            if text:
+                pages[-1].append(text)
+    headers = _header_footer_text(document)
+    total = len(pages) + (1 if headers else 0)
+    for number, page in enumerate(pages):
+        docs = []
+        if page:
+            docs.append(
+                Document(page_content="\n".join(page), metadata={"source": path, "page": number})
+            )
+        yield number + 1, total, docs
+    if headers:
+        yield total, total, [
+            Document(page_content="\n".join(headers), metadata={"source": path, "page": "header"})
+        ]
+
+
+def _text_sections(path):
+    total = os.path.getsize(path)
+    with open(path, "r", encoding="utf-8", errors="replace") as f:
+        while True:
+            lines = f.readlines(TEXT_SECTION_CHARS)
+            if not lines:
+                break
+            text = "".join(lines)
+            yield min(f.buffer.tell(), total), total, [
+                Document(page_content=text, metadata={"source": path})
+            ]
+
+
+def _unstructured_sections(path):
+    yield 1, 1, UnstructuredFileLoader(path).load()
+
+
+def iter_sections(path):
+    # (진행량, 전체량, 문서 목록) 을 페이지 순서대로 내보낸다
+    extension = os.path.splitext(path)[1].lower()
+    if extension == ".pdf":
+        sections = _pdf_sections
+    elif extension == ".docx":
+        sections = _docx_sections
+    elif extension in (".txt", ".md"):
+        sections = _text_sections
+    else:
+        sections = _unstructured_sections
+    if sections is _unstructured_sections:
+        yield from sections(path)
+        return
+    produced = False
+    try:
+        for done, total, docs in sections(path):
+            produced = produced or bool(docs)
+            yield done, total, docs
+    except Exception as e:
+        # 이미 문서를 내보냈다면 중복되지 않도록 다시 읽지 않는다
+        if produced:
+            raise
+        print(f"Falling back to UnstructuredFileLoader for {path}: {e}")
+    else:
+        if produced:
+            return
+        # 스캔본 PDF 처럼 텍스트 층이 없으면 OCR 을 하는 Unstructured 로 다시 읽는다
+        print(f"No text extracted from {path}, falling back to UnstructuredFileLoader")
+    yield from _unstructured_sections(path)
+
+
+def ingest_file(path, splitter, cached_embeddings=None, on_progress=None):
+    # 파싱이 끝난 구간부터 바로 나누고, 임베딩도 쌓이는 대로 미리 캐시에 넣어 둔다
+    docs = []
+    pending = []
+    for done, total, section in iter_sections(path):
+        chunks = splitter.split_documents(section)
+        docs.extend(chunks)
+        pending.extend(chunks)
+        if cached_embeddings is not None and len(pending) >= EMBED_BATCH_CHUNKS:
+            embed_texts([doc.page_content for doc in pending], cached_embeddings)
+            pending = []
+        if on_progress:
+            on_progress(done, total)
+    if cached_embeddings is not None and pending:
+        embed_texts([doc.page_content for doc in pending], cached_embeddings)
+    return docs
@@ -0,0 +1,144 @@
+import contextvars
+import hashlib
+import pickle
+import threading
+import time
+
+from langchain.cache import BaseCache
+from langchain.globals import set_llm_cache
+
+from utils.db import get_connection
+
+CACHE_PATH = "./.cache/llm_cache.db"
+DEFAULT_TTL = 60 * 60 * 24
+PAGE_TTLS = {
+    "DocumentGPT": 60 * 60 * 24,
+    "QuizGPT": 60 * 60 * 24 * 7,
+    "SiteGPT": 60 * 60 * 6,
+}
+MAX_BYTES = 200 * 1024 * 1024
+
+current_page = contextvars.ContextVar("current_page", default=None)
+
+
+class SQLiteLLMCache(BaseCache):
+    def __init__(
+        self,
+        path=CACHE_PATH,
+        default_ttl=DEFAULT_TTL,
+        page_ttls=PAGE_TTLS,
+        max_bytes=MAX_BYTES,
+    ):
+        self.path = path
+        self.default_ttl = default_ttl
+        self.page_ttls = page_ttls
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._counters = {}
+        get_connection(self.path).execute(
+            """
+            CREATE TABLE IF NOT EXISTS llm_cache (
+                key TEXT PRIMARY KEY,
+                page TEXT,
+                value BLOB NOT NULL,
+                size INTEGER NOT NULL,
+                expires_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            )
+            """
+        )
+
+    def _key(self, prompt, llm_string):
+        # llm_string 에 모델 이름, temperature, functions 등 모델 파라미터가 들어 있다
+        return hashlib.sha256(f"{llm_string}\0{prompt}".encode("utf-8")).hexdigest()
+
+    def _count(self, name):
+        page = current_page.get() or "default"
+        with self._lock:
+            counters = self._counters.setdefault(page, {"hits": 0, "misses": 0})
+            counters[name] += 1
+
+    def lookup(self, prompt, llm_string):
+        connection = get_connection(self.path)
+        key = self._key(prompt, llm_string)
+        now = time.time()
+        row = connection.execute(
+            "SELECT value, expires_at FROM llm_cache WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None or row[1] < now:
+            self._count("misses")
+            return None
+        connection.execute(
+            "UPDATE llm_cache SET accessed_at = ? WHERE key = ?", (now, key)
+        )
+        self._count("hits")
+        return pickle.loads(row[0])
+
+    def update(self, prompt, llm_string, return_val):
+        connection = get_connection(self.path)
+        page = current_page.get()
+        ttl = self.page_ttls.get(page, self.default_ttl)
+        value = pickle.dumps(return_val)
+        now = time.time()
+        connection.execute(
+            "INSERT OR REPLACE INTO llm_cache VALUES (?, ?, ?, ?, ?, ?)",
+            (self._key(prompt, llm_string), page, value, len(value), now + ttl, now),
+        )
+        self._evict(connection, now)
+
+    def _evict(self, connection, now):
+        connection.execute("DELETE FROM llm_cache WHERE expires_at < ?", (now,))
+        total = connection.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM llm_cache"
+        ).fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        rows = connection.execute(
+            "SELECT key, size FROM llm_cache ORDER BY accessed_at"
+        ).fetchall()
+        evicted = []
+        for key, size in rows:
+            if total <= self.max_bytes:
+                break
+            evicted.append((key,))
+            total -= size
+        connection.executemany("DELETE FROM llm_cache WHERE key = ?", evicted)
+
+    def clear(self, **kwargs):
+        get_connection(self.path).execute("DELETE FROM llm_cache")
+
+    def stats(self):
+        with self._lock:
+            return {page: dict(counters) for page, counters in self._counters.items()}
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def setup_llm_cache():
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = SQLiteLLMCache()
+            set_llm_cache(_cache)
+    return _cache
+
+
+def bind_current_page(func):
+    # Runnable.batch 는 ThreadPoolExecutor 에서 돌아 작업 스레드에 current_page 가 없다.
+    # 호출한 스레드의 컨텍스트를 잡아 두고 호출마다 그 사본 안에서 실행한다
+    # (Context 하나를 여러 스레드가 동시에 run 할 수 없어 매번 copy 한다)
+    context = contextvars.copy_context()
+
+    def run(*args, **kwargs):
+        return context.copy().run(func, *args, **kwargs)
+
+    return run
+
+
+def use_llm_cache(page):
+    # 페이지 이름으로 TTL 을 고르므로 각 페이지 스크립트 맨 위에서 호출한다
+    cache = setup_llm_cache()
+    current_page.set(page)
+    return cache
@@ -0,0 +1,219 @@
+import json
+import math
+import re
+from concurrent.futures import ThreadPoolExecutor
+
+from langchain.chat_models import ChatOpenAI
+from langchain.prompts import ChatPromptTemplate
+
+from utils.embedding_pipeline import get_encoding
+from utils.llm_cache import bind_current_page
+
+QUIZ_QUESTIONS = 10
+SECTION_TOKENS = 2500
+MAX_SECTIONS = 5
+MAX_CONCURRENCY = 4
+DUPLICATE_THRESHOLD = 0.8
+TOP_UP_ATTEMPTS = 3
+
+QUIZ_FUNCTION = {
+    "name": "create_quiz",
+    "description": "function that takes a list of questions and answers and returns a quiz",
+    "parameters": {
+        "type": "object",
+        "properties": {
+            "questions": {
+                "type": "array",
+                "items": {
+                    "type": "object",
+                    "properties": {
+                        "question": {
+                            "type": "string",
+                        },
+                        "answers": {
+                            "type": "array",
+                            "items": {
+                                "type": "object",
+                                "properties": {
+                                    "answer": {
+                                        "type": "string",
+                                    },
+                                    "correct": {
+                                        "type": "boolean",
+                                    },
+                                },
+                                "required": ["answer", "correct"],
+                            },
+                        },
+                    },
+                    "required": ["question", "answers"],
+                },
+            }
+        },
+        "required": ["questions"],
+    },
+}
+
+questions_prompt = ChatPromptTemplate.from_messages(
+    [
+        (
+            "system",
+            """
+    You are a helpful assistant that is role playing as a teacher.
+
+    Based ONLY on the following context make {count} questions to test the user's knowledge about the text.
+    The questions' difficulty should follow 'Difficulty' that has three types of easy, medium and hard.
+    Each question should have 4 answers, three of them must be incorrect and one should be correct.
+    Your turn!
+
+    Difficulty: {difficulty}
+    Context: {context}
+""",
+        )
+    ]
+)
+
+
+def make_quiz_llm(api_key, **kwargs):
+    return ChatOpenAI(
+        temperature=0.1,
+        openai_api_key=api_key,
+        **kwargs,
+    ).bind(
+        function_call={
+            "name": "create_quiz",
+        },
+        functions=[
+            QUIZ_FUNCTION,
+        ],
+    )
+
+
+def make_sections(docs, max_tokens=SECTION_TOKENS):
+    # 이어지는 청크를 토큰 예산 안에서 묶는다. 예산보다 큰 문서 하나는 앞부분만 쓴다
+    encoding = get_encoding()
+    sections = []
+    current = []
+    current_tokens = 0
+    for doc in docs:
+        tokens = encoding.encode_ordinary(doc.page_content)
+        if len(tokens) > max_tokens:
+            text = encoding.decode(tokens[:max_tokens])
+            tokens = tokens[:max_tokens]
+        else:
+            text = doc.page_content
+        if current and current_tokens + len(tokens) > max_tokens:
+            sections.append("\n\n".join(current))
+            current = []
+            current_tokens = 0
+        current.append(text)
+        current_tokens += len(tokens)
+    if current:
+        sections.append("\n\n".join(current))
+    return sections
+
+
+def sample_sections(sections, count):
+    # 문서 앞부분만 쓰지 않도록 전체에서 고르게 뽑는다
+    if len(sections) <= count:
+        return list(sections)
+    step = (len(sections) - 1) / (count - 1) if count > 1 else 0
+    return [sections[round(i * step)] for i in range(count)]
+
+
+def question_words(question):
+    return set(re.findall(r"\w+", question["question"].lower()))
+
+
+def is_duplicate(question, seen, threshold=DUPLICATE_THRESHOLD):
+    words = question_words(question)
+    for other in seen:
+        union = words | other
+        if union and len(words & other) / len(union) >= threshold:
+            return True
+    return False
+
+
+def zip_longest_questions(batches):
+    longest = max((len(batch) for batch in batches), default=0)
+    for i in range(longest):
+        yield [batch[i] for batch in batches if i < len(batch)]
+
+
+def merge_questions(batches, count, seen=None):
+    # 섹션마다 한 문제씩 번갈아 뽑아 특정 부분에 치우치지 않게 한다
+    seen = [] if seen is None else seen
+    merged = []
+    for round_questions in zip_longest_questions(batches):
+        for question in round_questions:
+            if len(merged) == count:
+                return merged
+            if is_duplicate(question, seen):
+                continue
+            seen.append(question_words(question))
+            merged.append(question)
+    return merged
+
+
+def parse_questions(response):
+    if isinstance(response, Exception):
+        print(f"Quiz section failed: {response}")
+        return []
+    try:
+        arguments = response.additional_kwargs["function_call"]["arguments"]
+        return json.loads(arguments)["questions"]
+    except (KeyError, ValueError) as e:
+        print(f"Could not parse quiz section: {e}")
+        return []
+
+
+def generate_questions(sections, difficulty, llm, per_section):
+    chain = questions_prompt | llm
+
+    # chain.batch 대신 직접 스레드를 돌려 LLM 캐시가 페이지별 TTL/통계를 쓰도록 한다
+    @bind_current_page
+    def invoke(section):
+        try:
+            return chain.invoke(
+                {"context": section, "difficulty": difficulty, "count": per_section}
+            )
+        except Exception as e:
+            return e
+
+    with ThreadPoolExecutor(max_workers=MAX_CONCURRENCY) as executor:
+        responses = list(executor.map(invoke, sections))
+    # 일부 섹션만 실패하면 건너뛰지만, 모두 실패했으면 (잘못된 키, 한도 초과 등) 더 채워도
+    # 소용없으니 실제 오류를 그대로 올린다
+    errors = [response for response in responses if isinstance(response, Exception)]
+    if errors and len(errors) == len(responses):
+        raise errors[0]
+    return [parse_questions(response) for response in responses]
+
+
+def generate_quiz(docs, difficulty, llm, count=QUIZ_QUESTIONS, attempts=TOP_UP_ATTEMPTS):
+    sections = make_sections(docs)
+    if not sections:
+        return {"questions": []}
+    chosen = sample_sections(sections, min(MAX_SECTIONS, count))
+    # 중복 제거로 줄어들 것을 감안해 섹션이 여러 개면 한 문제씩 더 만든다
+    per_section = math.ceil(count / len(chosen)) + (1 if len(chosen) > 1 else 0)
+    seen = []
+    questions = merge_questions(
+        generate_questions(chosen, difficulty, llm, per_section), count, seen
+    )
+    used = list(chosen)
+    for _ in range(attempts):
+        if len(questions) >= count:
+            break
+        # 모자라면 아직 안 쓴 섹션에서, 다 썼으면 전체 섹션에서 다시 골라 채운다
+        missing = count - len(questions)
+        unused = [section for section in sections if section not in used]
+        retry = sample_sections(unused or sections, min(MAX_SECTIONS, missing))
+        used += retry
+        questions += merge_questions(
+            generate_questions(retry, difficulty, llm, math.ceil(missing / len(retry)) + 1),
+            missing,
+            seen,
+        )
+    print(f"Quiz from {len(sections)} sections: {len(questions)}/{count} questions")
+    return {"questions": questions}
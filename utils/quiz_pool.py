@@ -0,0 +1,210 @@
+import hashlib
+import json
+import os
+import threading
+import time
+
+from langchain.retrievers import WikipediaRetriever
+
+from utils.db import get_connection
+from utils.quiz import QUIZ_QUESTIONS, generate_quiz, make_quiz_llm
+from utils.quiz_store import STORE_PATH, model_settings, normalize_topic
+
+# QUIZ_POOL_ENABLED=0 이면 풀을 쓰지 않는다 (백그라운드 생성도 하지 않는다)
+POOL_ENABLED = os.environ.get("QUIZ_POOL_ENABLED", "1") != "0"
+# 인기 (주제, 난이도) 마다 미리 만들어 둘 퀴즈 수와 하루 생성 한도
+POOL_SIZE = int(os.environ.get("QUIZ_POOL_SIZE", "3"))
+POOL_TOPICS = int(os.environ.get("QUIZ_POOL_TOPICS", "20"))
+POOL_DAILY_BUDGET = int(os.environ.get("QUIZ_POOL_DAILY_BUDGET", "50"))
+TRENDING_WINDOW = 60 * 60 * 24 * 7
+POOL_TTL = 60 * 60 * 24 * 7
+REFILL_INTERVAL = 60 * 10
+
+
+def pool_settings(llm, count=QUIZ_QUESTIONS):
+    # 모델/프롬프트/문제 수가 바뀌면 예전 설정으로 만든 퀴즈는 꺼내지 않는다
+    raw = f"{model_settings(llm)}\0{count}"
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class QuizPool:
+    def __init__(
+        self,
+        path=STORE_PATH,
+        size=POOL_SIZE,
+        topics=POOL_TOPICS,
+        daily_budget=POOL_DAILY_BUDGET,
+        api_key=None,
+        count=QUIZ_QUESTIONS,
+    ):
+        self.path = path
+        self.size = size
+        self.topics = topics
+        self.daily_budget = daily_budget
+        self.api_key = api_key
+        self.count = count
+        self._wake = threading.Event()
+        self._worker = None
+        connection = get_connection(self.path)
+        columns = [row[1] for row in connection.execute("PRAGMA table_info(quiz_pool)")]
+        if columns and "settings" not in columns:
+            # 설정 열이 없던 예전 풀은 어떤 설정으로 만들었는지 알 수 없으니 버린다
+            connection.execute("DROP TABLE quiz_pool")
+        connection.execute(
+            """
+            CREATE TABLE IF NOT EXISTS quiz_requests (
+                topic TEXT NOT NULL,
+                difficulty TEXT NOT NULL,
+                requested_at REAL NOT NULL
+            )
+            """
+        )
+        connection.execute(
+            """
+            CREATE TABLE IF NOT EXISTS quiz_pool (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                topic TEXT NOT NULL,
+                difficulty TEXT NOT NULL,
+                settings TEXT NOT NULL,
+                quiz TEXT NOT NULL,
+                created_at REAL NOT NULL
+            )
+            """
+        )
+        connection.execute(
+            "CREATE TABLE IF NOT EXISTS quiz_pool_log (generated_at REAL NOT NULL)"
+        )
+
+    def record_request(self, topic, difficulty):
+        get_connection(self.path).execute(
+            "INSERT INTO quiz_requests VALUES (?, ?, ?)",
+            (normalize_topic(topic), difficulty, time.time()),
+        )
+
+    def take(self, topic, difficulty, settings):
+        # 한 퀴즈를 두 세션이 같이 가져가지 않도록 꺼내기와 지우기를 한 트랜잭션으로 묶는다
+        connection = get_connection(self.path)
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            row = connection.execute(
+                """
+                SELECT id, quiz FROM quiz_pool
+                WHERE topic = ? AND difficulty = ? AND settings = ? AND created_at > ?
+                ORDER BY created_at LIMIT 1
+                """,
+                (normalize_topic(topic), difficulty, settings, time.time() - POOL_TTL),
+            ).fetchone()
+            if row is not None:
+                connection.execute("DELETE FROM quiz_pool WHERE id = ?", (row[0],))
+            connection.execute("COMMIT")
+        except Exception:
+            connection.execute("ROLLBACK")
+            raise
+        self._wake.set()
+        return json.loads(row[1]) if row else None
+
+    def trending(self):
+        return get_connection(self.path).execute(
+            """
+            SELECT topic, difficulty FROM quiz_requests
+            WHERE requested_at > ?
+            GROUP BY topic, difficulty
+            ORDER BY COUNT(*) DESC
+            LIMIT ?
+            """,
+            (time.time() - TRENDING_WINDOW, self.topics),
+        ).fetchall()
+
+    def pooled(self, topic, difficulty, settings):
+        return get_connection(self.path).execute(
+            """
+            SELECT COUNT(*) FROM quiz_pool
+            WHERE topic = ? AND difficulty = ? AND settings = ? AND created_at > ?
+            """,
+            (topic, difficulty, settings, time.time() - POOL_TTL),
+        ).fetchone()[0]
+
+    def budget_left(self):
+        used = get_connection(self.path).execute(
+            "SELECT COUNT(*) FROM quiz_pool_log WHERE generated_at > ?",
+            (time.time() - 60 * 60 * 24,),
+        ).fetchone()[0]
+        return self.daily_budget - used
+
+    def refill(self):
+        connection = get_connection(self.path)
+        now = time.time()
+        connection.execute("DELETE FROM quiz_pool WHERE created_at <= ?", (now - POOL_TTL,))
+        connection.execute("DELETE FROM quiz_requests WHERE requested_at <= ?", (now - TRENDING_WINDOW,))
+        # 풀용 퀴즈는 LLM 캐시를 거치면 모두 같은 퀴즈가 되므로 캐시를 끈다
+        llm = make_quiz_llm(self.api_key, cache=False)
+        settings = pool_settings(llm, self.count)
+        for topic, difficulty in self.trending():
+            if self.budget_left() <= 0:
+                print("Quiz pool budget used up for today")
+                return
+            # 한 주제에서 실패해도 (위키피디아/LLM 오류 등) 나머지 주제는 계속 채운다
+            try:
+                self._refill_topic(topic, difficulty, llm, settings)
+            except Exception as e:
+                print(f"Quiz pool refill failed for {difficulty} {topic}: {e}")
+
+    def _refill_topic(self, topic, difficulty, llm, settings):
+        connection = get_connection(self.path)
+        docs = None
+        for _ in range(self.size - self.pooled(topic, difficulty, settings)):
+            if self.budget_left() <= 0:
+                return
+            if docs is None:
+                docs = WikipediaRetriever(top_k_results=5).get_relevant_documents(topic)
+            quiz = generate_quiz(docs, difficulty, llm, self.count)
+            connection.execute(
+                "INSERT INTO quiz_pool_log VALUES (?)", (time.time(),)
+            )
+            if not quiz["questions"]:
+                break
+            connection.execute(
+                """
+                INSERT INTO quiz_pool (topic, difficulty, settings, quiz, created_at)
+                VALUES (?, ?, ?, ?, ?)
+                """,
+                (
+                    topic,
+                    difficulty,
+                    settings,
+                    json.dumps(quiz, ensure_ascii=False),
+                    time.time(),
+                ),
+            )
+            print(f"Pooled a {difficulty} quiz for {topic}")
+
+    def _run(self):
+        while True:
+            self._wake.wait(REFILL_INTERVAL)
+            self._wake.clear()
+            try:
+                self.refill()
+            except Exception as e:
+                print(f"Quiz pool refill failed: {e}")
+
+    def start(self):
+        if self._worker is None and self.api_key:
+            self._worker = threading.Thread(target=self._run, daemon=True)
+            self._worker.start()
+            self._wake.set()
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_quiz_pool():
+    # 백그라운드 생성은 사용자 키가 아니라 서버의 OPENAI_API_KEY 로만 한다
+    global _pool
+    if not POOL_ENABLED:
+        return None
+    with _pool_lock:
+        if _pool is None:
+            _pool = QuizPool(api_key=os.environ.get("OPENAI_API_KEY"))
+            _pool.start()
+    return _pool
@@ -0,0 +1,141 @@
+import hashlib
+import json
+import threading
+import time
+
+from utils.db import get_connection
+from utils.quiz import QUIZ_FUNCTION, SECTION_TOKENS, questions_prompt
+
+STORE_PATH = "./.cache/quizzes.db"
+MAX_ENTRIES = 5000
+# 위키피디아 문서는 바뀌므로 주제로 찾은 퀴즈는 이 기간만 쓴다
+TOPIC_TTL = 60 * 60 * 24 * 7
+
+
+def normalize_topic(topic):
+    return " ".join(topic.lower().split())
+
+
+def content_hash(docs):
+    digest = hashlib.sha256()
+    for doc in docs:
+        digest.update(doc.page_content.encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+def model_settings(llm):
+    # 모델/온도뿐 아니라 프롬프트나 함수 스키마가 바뀌어도 예전 퀴즈를 쓰지 않도록 함께 넣는다
+    model = getattr(llm, "bound", llm)
+    return json.dumps(
+        {
+            "model": getattr(model, "model_name", type(model).__name__),
+            "temperature": getattr(model, "temperature", None),
+            "prompt": questions_prompt.messages[0].prompt.template,
+            "function": QUIZ_FUNCTION,
+            "section_tokens": SECTION_TOKENS,
+        },
+        sort_keys=True,
+    )
+
+
+def quiz_key(docs, difficulty, count, settings):
+    raw = f"{content_hash(docs)}\0{difficulty}\0{count}\0{settings}"
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def topic_key(topic, difficulty, count, settings):
+    # 문서 내용을 알기 전(위키피디아 검색 전)에 쓰는 키. quiz_key 로 가는 별칭으로 저장한다
+    raw = f"{normalize_topic(topic)}\0{difficulty}\0{count}\0{settings}"
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class QuizStore:
+    def __init__(self, path=STORE_PATH, max_entries=MAX_ENTRIES):
+        self.path = path
+        self.max_entries = max_entries
+        connection = get_connection(self.path)
+        connection.execute(
+            """
+            CREATE TABLE IF NOT EXISTS quizzes (
+                key TEXT PRIMARY KEY,
+                source TEXT,
+                difficulty TEXT NOT NULL,
+                quiz TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            )
+            """
+        )
+        connection.execute(
+            """
+            CREATE TABLE IF NOT EXISTS quiz_aliases (
+                alias TEXT PRIMARY KEY,
+                key TEXT NOT NULL,
+                created_at REAL NOT NULL
+            )
+            """
+        )
+
+    def get(self, key):
+        connection = get_connection(self.path)
+        row = connection.execute("SELECT quiz FROM quizzes WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        connection.execute(
+            "UPDATE quizzes SET accessed_at = ? WHERE key = ?", (time.time(), key)
+        )
+        return json.loads(row[0])
+
+    def get_alias(self, alias):
+        row = get_connection(self.path).execute(
+            "SELECT key FROM quiz_aliases WHERE alias = ? AND created_at > ?",
+            (alias, time.time() - TOPIC_TTL),
+        ).fetchone()
+        return self.get(row[0]) if row else None
+
+    def put_alias(self, alias, key):
+        get_connection(self.path).execute(
+            "INSERT OR REPLACE INTO quiz_aliases VALUES (?, ?, ?)", (alias, key, time.time())
+        )
+
+    def put(self, key, quiz, source=None, difficulty=""):
+        if not quiz.get("questions"):
+            return
+        connection = get_connection(self.path)
+        now = time.time()
+        connection.execute(
+            "INSERT OR REPLACE INTO quizzes VALUES (?, ?, ?, ?, ?, ?)",
+            (key, source, difficulty, json.dumps(quiz, ensure_ascii=False), now, now),
+        )
+        self._evict(connection)
+
+    def _evict(self, connection):
+        # 가장 오래 안 쓴 퀴즈부터 지워 max_entries 개만 남긴다
+        connection.execute(
+            """
+            DELETE FROM quizzes WHERE key IN (
+                SELECT key FROM quizzes ORDER BY accessed_at DESC LIMIT -1 OFFSET ?
+            )
+            """,
+            (self.max_entries,),
+        )
+        connection.execute(
+            """
+            DELETE FROM quiz_aliases
+            WHERE created_at <= ? OR key NOT IN (SELECT key FROM quizzes)
+            """,
+            (time.time() - TOPIC_TTL,),
+        )
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_quiz_store():
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = QuizStore()
+    return _store
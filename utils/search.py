@@ -0,0 +1,168 @@
+import re
+import threading
+import time
+
+import yfinance
+from langchain.utilities.duckduckgo_search import DuckDuckGoSearchAPIWrapper
+from langchain.utilities.wikipedia import WikipediaAPIWrapper
+
+from utils.db import get_connection
+
+CACHE_PATH = "./.cache/search.db"
+SEARCH_TTL = 60 * 60 * 24
+# 검색으로 찾은 티커는 상장폐지/변경될 수 있으니 일정 기간 뒤 다시 찾는다
+TICKER_TTL = 60 * 60 * 24 * 30
+COMMON_TICKERS = {
+    "apple": "AAPL",
+    "microsoft": "MSFT",
+    "alphabet": "GOOGL",
+    "google": "GOOGL",
+    "amazon": "AMZN",
+    "meta": "META",
+    "meta platforms": "META",
+    "facebook": "META",
+    "nvidia": "NVDA",
+    "tesla": "TSLA",
+    "netflix": "NFLX",
+    "intel": "INTC",
+    "amd": "AMD",
+    "advanced micro devices": "AMD",
+    "ibm": "IBM",
+    "oracle": "ORCL",
+    "salesforce": "CRM",
+    "adobe": "ADBE",
+    "berkshire hathaway": "BRK-B",
+    "walmart": "WMT",
+    "disney": "DIS",
+    "coca cola": "KO",
+    "samsung electronics": "005930.KS",
+}
+COMPANY_SUFFIXES = {"inc", "incorporated", "corp", "corporation", "co", "company", "ltd", "plc"}
+TICKER_RE = re.compile(r"\((?:NASDAQ|NYSE|NYSEARCA|NYSEAMERICAN|AMEX)\s*:\s*([A-Z][A-Z.\-]{0,6})\)")
+
+
+def normalize_query(query):
+    return " ".join(query.lower().split())
+
+
+def normalize_company(name):
+    words = re.sub(r"[^\w\s]", " ", name.lower()).split()
+    while words and words[-1] in COMPANY_SUFFIXES:
+        words.pop()
+    return " ".join(words)
+
+
+class SearchClient:
+    def __init__(self, path=CACHE_PATH, ttl=SEARCH_TTL, ticker_ttl=TICKER_TTL):
+        self.path = path
+        self.ttl = ttl
+        self.ticker_ttl = ticker_ttl
+        self._lock = threading.Lock()
+        self._duckduckgo = None
+        self._wikipedia = None
+        connection = get_connection(self.path)
+        connection.execute(
+            """
+            CREATE TABLE IF NOT EXISTS search_cache (
+                engine TEXT NOT NULL,
+                query TEXT NOT NULL,
+                result TEXT NOT NULL,
+                fetched_at REAL NOT NULL,
+                PRIMARY KEY (engine, query)
+            )
+            """
+        )
+        connection.execute(
+            """
+            CREATE TABLE IF NOT EXISTS tickers (
+                company TEXT PRIMARY KEY,
+                ticker TEXT NOT NULL,
+                updated_at REAL NOT NULL
+            )
+            """
+        )
+
+    @property
+    def duckduckgo_wrapper(self):
+        with self._lock:
+            if self._duckduckgo is None:
+                self._duckduckgo = DuckDuckGoSearchAPIWrapper()
+            return self._duckduckgo
+
+    @property
+    def wikipedia_wrapper(self):
+        with self._lock:
+            if self._wikipedia is None:
+                self._wikipedia = WikipediaAPIWrapper()
+            return self._wikipedia
+
+    def _cached(self, engine, query, fetch):
+        connection = get_connection(self.path)
+        key = normalize_query(query)
+        row = connection.execute(
+            "SELECT result, fetched_at FROM search_cache WHERE engine = ? AND query = ?",
+            (engine, key),
+        ).fetchone()
+        if row and time.time() - row[1] < self.ttl:
+            print(f"Search cache hit ({engine}): {key}")
+            return row[0]
+        result = fetch(query)
+        connection.execute(
+            "INSERT OR REPLACE INTO search_cache VALUES (?, ?, ?, ?)",
+            (engine, key, result, time.time()),
+        )
+        return result
+
+    def duckduckgo(self, query):
+        return self._cached("duckduckgo", query, self.duckduckgo_wrapper.run)
+
+    def wikipedia(self, query):
+        return self._cached("wikipedia", query, self.wikipedia_wrapper.run)
+
+    def lookup_ticker(self, company_name):
+        # 잘 알려진 회사는 검색 결과보다 고정 표를 먼저 믿는다
+        company = normalize_company(company_name)
+        if company in COMMON_TICKERS:
+            return COMMON_TICKERS[company]
+        row = get_connection(self.path).execute(
+            "SELECT ticker, updated_at FROM tickers WHERE company = ?", (company,)
+        ).fetchone()
+        if row and time.time() - row[1] < self.ticker_ttl:
+            return row[0]
+        return None
+
+    def remember_ticker(self, company_name, ticker):
+        get_connection(self.path).execute(
+            "INSERT OR REPLACE INTO tickers VALUES (?, ?, ?)",
+            (normalize_company(company_name), ticker, time.time()),
+        )
+
+    def is_valid_ticker(self, ticker):
+        # 검색 결과에 처음 나온 (거래소: 티커) 가 다른 회사일 수도 있으니 실제 시세가 있는지 확인한다
+        try:
+            return not yfinance.Ticker(ticker).history(period="5d").empty
+        except Exception as e:
+            print(f"Could not validate ticker {ticker}: {e}")
+            return False
+
+    def get_ticker(self, company_name):
+        ticker = self.lookup_ticker(company_name)
+        if ticker:
+            return f"The ticker symbol of {company_name} is {ticker}."
+        result = self.duckduckgo(f"Ticker symbol of {company_name}")
+        for candidate in dict.fromkeys(TICKER_RE.findall(result)):
+            if self.is_valid_ticker(candidate):
+                self.remember_ticker(company_name, candidate)
+                break
+        return result
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_search_client():
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = SearchClient()
+    return _client
@@ -0,0 +1,134 @@
+import json
+import os
+import shutil
+import threading
+
+import numpy as np
+from langchain.vectorstores.faiss import dependable_faiss_import
+
+CACHE_ROOT = "./.cache/semantic"
+# 코사인 유사도가 이 값 이상이면 같은 질문으로 본다. SEMANTIC_CACHE_THRESHOLD 로 바꿀 수 있다
+SIMILARITY_THRESHOLD = float(os.environ.get("SEMANTIC_CACHE_THRESHOLD", "0.95"))
+# 새 질문마다 전체를 다시 쓰지 않도록 벡터와 답을 파일 끝에 덧붙인다
+META_FILE = "meta.json"
+VECTORS_FILE = "vectors.f32"
+ENTRIES_FILE = "entries.jsonl"
+
+
+class SemanticCache:
+    def __init__(self, namespace, embeddings, version=None, threshold=SIMILARITY_THRESHOLD):
+        self.path = os.path.join(CACHE_ROOT, namespace)
+        self.embeddings = embeddings
+        self.version = version
+        self.threshold = threshold
+        self._lock = threading.Lock()
+        self._faiss = dependable_faiss_import()
+        self._vectors = {}
+        self._load()
+
+    def _file(self, name):
+        return os.path.join(self.path, name)
+
+    def _load(self):
+        self._index = None
+        self._entries = []
+        if not os.path.isfile(self._file(META_FILE)):
+            # 비어 있거나 예전 형식(questions.faiss + entries.json)이면 지운다
+            shutil.rmtree(self.path, ignore_errors=True)
+            return
+        with open(self._file(META_FILE), "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        # 질문 인덱스가 다른 버전의 문서/사이트 인덱스로 만들어졌으면 버린다
+        if meta.get("version") != self.version:
+            self.invalidate()
+            return
+        entries = []
+        if os.path.isfile(self._file(ENTRIES_FILE)):
+            with open(self._file(ENTRIES_FILE), "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        entries.append(json.loads(line))
+                    except ValueError:
+                        break
+        dim = meta["dim"]
+        data = np.array([], dtype="float32")
+        if os.path.isfile(self._file(VECTORS_FILE)):
+            data = np.fromfile(self._file(VECTORS_FILE), dtype="float32")
+        vectors = data[: len(data) // dim * dim].reshape(-1, dim)
+        # 덧붙이다 중간에 죽으면 두 파일 길이가 어긋날 수 있다. 짧은 쪽에 맞춰 다시 쓴다
+        count = min(len(entries), len(vectors))
+        self._entries = entries[:count]
+        self._index = self._faiss.IndexFlatIP(dim)
+        self._index.add(np.ascontiguousarray(vectors[:count]))
+        if count != len(entries) or count != len(vectors) or len(data) % dim:
+            self._rewrite()
+
+    def _embed(self, question):
+        vector = self._vectors.get(question)
+        if vector is None:
+            vector = np.array([self.embeddings.embed_query(question)], dtype="float32")
+            self._faiss.normalize_L2(vector)
+            self._vectors = {question: vector}
+        return vector
+
+    def lookup(self, question):
+        vector = self._embed(question)
+        with self._lock:
+            if self._index is None or not self._entries:
+                return None
+            scores, ids = self._index.search(vector, 1)
+        if ids[0][0] < 0 or scores[0][0] < self.threshold:
+            return None
+        print(f"Semantic cache hit ({scores[0][0]:.3f}): {question}")
+        return self._entries[ids[0][0]]["answer"]
+
+    def update(self, question, answer):
+        vector = self._embed(question)
+        entry = {"question": question, "answer": answer}
+        with self._lock:
+            if self._index is None:
+                self._index = self._faiss.IndexFlatIP(vector.shape[1])
+                self._write_meta()
+            self._index.add(vector)
+            self._entries.append(entry)
+            self._append(vector, entry)
+
+    def _write_meta(self):
+        os.makedirs(self.path, exist_ok=True)
+        with open(self._file(META_FILE), "w", encoding="utf-8") as f:
+            json.dump({"version": self.version, "dim": self._index.d}, f)
+
+    def _append(self, vector, entry):
+        # 벡터를 먼저 쓰므로 중간에 죽어도 답 없는 벡터만 남고, _load 가 잘라낸다
+        with open(self._file(VECTORS_FILE), "ab") as f:
+            f.write(vector.astype("float32").tobytes())
+        with open(self._file(ENTRIES_FILE), "a", encoding="utf-8") as f:
+            f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+
+    def _rewrite(self):
+        self._write_meta()
+        vectors = self._index.reconstruct_n(0, self._index.ntotal)
+        vectors.astype("float32").tofile(self._file(VECTORS_FILE))
+        with open(self._file(ENTRIES_FILE), "w", encoding="utf-8") as f:
+            for entry in self._entries:
+                f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+
+    def invalidate(self):
+        self._index = None
+        self._entries = []
+        shutil.rmtree(self.path, ignore_errors=True)
+
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+
+def get_semantic_cache(namespace, embeddings, version=None, threshold=SIMILARITY_THRESHOLD):
+    with _caches_lock:
+        cache = _caches.get(namespace)
+        if cache is None or cache.version != version:
+            if cache is not None:
+                cache.invalidate()
+            cache = _caches[namespace] = SemanticCache(namespace, embeddings, version, threshold)
+        cache.threshold = threshold
+        return cache
@@ -0,0 +1,129 @@
+import hashlib
+import json
+import os
+
+from langchain.schema import Document
+
+from utils.embedding_pipeline import embed_texts
+from utils.faiss_store import (
+    build_index,
+    delete_documents,
+    index_exists,
+    load_index,
+    save_index,
+)
+
+INDEX_DIR = "./.cache/site/index"
+MANIFEST_PATH = "./.cache/site/manifest.json"
+
+
+def load_manifest(path):
+    if not os.path.isfile(path):
+        return {}
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def manifest_version(path=MANIFEST_PATH):
+    if not os.path.isfile(path):
+        return None
+    with open(path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def save_manifest(manifest, path):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f)
+    os.replace(tmp_path, path)
+
+
+def chunk_ids(url, content_hash, count):
+    url_hash = hashlib.sha256(url.encode("utf-8")).hexdigest()[:16]
+    return [f"{url_hash}-{content_hash[:8]}-{i}" for i in range(count)]
+
+
+def refresh_site_index(
+    loader, splitter, embeddings, index_dir=INDEX_DIR, manifest_path=MANIFEST_PATH
+):
+    # manifest: {url: {"lastmod": ..., "hash": ..., "ids": [...]}}
+    manifest = load_manifest(manifest_path)
+    vectorstore = None
+    if manifest and index_exists(index_dir):
+        vectorstore = load_index(index_dir, embeddings, mmap=False)
+    else:
+        manifest = {}
+
+    entries = {}
+    for el in loader.parse_sitemap(loader.scrape("xml")):
+        if "loc" in el:
+            entries[el["loc"].strip()] = el
+    removed = [url for url in manifest if url not in entries]
+    # lastmod 가 없는 페이지는 다시 받아서 내용 해시로 비교
+    stale = [
+        url
+        for url, el in entries.items()
+        if url not in manifest
+        or el.get("lastmod") is None
+        or manifest[url]["lastmod"] != el.get("lastmod")
+    ]
+
+    delete_ids = []
+    for url in removed:
+        delete_ids.extend(manifest.pop(url)["ids"])
+
+    new_docs = []
+    new_ids = []
+    soups = loader.scrape_all(stale) if stale else []
+    for url, soup in zip(stale, soups):
+        el = entries[url]
+        content = loader.parsing_function(soup)
+        content_hash = hashlib.sha256(content.encode("utf-8")).hexdigest()
+        entry = manifest.get(url)
+        if entry and entry["hash"] == content_hash:
+            entry["lastmod"] = el.get("lastmod")
+            if vectorstore is not None:
+                for id in entry["ids"]:
+                    doc = vectorstore.docstore.search(id)
+                    if isinstance(doc, Document):
+                        doc.metadata["lastmod"] = el.get("lastmod")
+            continue
+        if entry:
+            delete_ids.extend(entry["ids"])
+        docs = splitter.split_documents(
+            [Document(page_content=content, metadata=loader.meta_function(el, soup))]
+        )
+        ids = chunk_ids(url, content_hash, len(docs))
+        manifest[url] = {
+            "lastmod": el.get("lastmod"),
+            "hash": content_hash,
+            "ids": ids,
+        }
+        new_docs.extend(docs)
+        new_ids.extend(ids)
+
+    print(
+        f"Site index: {len(entries)} pages, {len(stale)} fetched, "
+        f"{len(new_docs)} chunks embedded, {len(removed)} removed"
+    )
+    if vectorstore is not None and not stale and not removed:
+        return vectorstore
+
+    if delete_ids and vectorstore is not None:
+        vectorstore = delete_documents(vectorstore, delete_ids, embeddings)
+    if new_docs:
+        if vectorstore is None:
+            vectorstore = build_index(new_docs, embeddings, ids=new_ids)
+        else:
+            texts = [doc.page_content for doc in new_docs]
+            vectors = embed_texts(texts, embeddings)
+            vectorstore.add_embeddings(
+                list(zip(texts, vectors)),
+                metadatas=[doc.metadata for doc in new_docs],
+                ids=new_ids,
+            )
+    if vectorstore is None:
+        raise ValueError("No pages matched the sitemap filter.")
+    save_index(vectorstore, index_dir)
+    save_manifest(manifest, manifest_path)
+    return vectorstore
@@ -0,0 +1,60 @@
+import time
+
+import streamlit as st
+
+FLUSH_INTERVAL = 0.05
+FLUSH_CHARS = 200
+
+
+def escape_dollars(text):
+    return text.replace("$", "\\$")
+
+
+class StreamingRenderer:
+    # 토큰마다 전체 메시지를 다시 그리지 않고, 일정 시간이나 글자 수가 쌓였을 때만 그린다
+    def __init__(
+        self,
+        box=None,
+        escape=False,
+        interval=FLUSH_INTERVAL,
+        max_chars=FLUSH_CHARS,
+    ):
+        self.box = box if box is not None else st.empty()
+        self.escape = escape
+        self.interval = interval
+        self.max_chars = max_chars
+        self.text = ""
+        self.pending = []
+        self.pending_chars = 0
+        self.last_flush = time.monotonic()
+        self.renders = 0
+        self.bytes_sent = 0
+
+    def append(self, delta):
+        if not delta:
+            return
+        self.pending.append(delta)
+        self.pending_chars += len(delta)
+        if (
+            self.pending_chars >= self.max_chars
+            or time.monotonic() - self.last_flush >= self.interval
+        ):
+            self.flush()
+
+    def flush(self):
+        if self.pending:
+            self.text += "".join(self.pending)
+            self.pending = []
+            self.pending_chars = 0
+        self.last_flush = time.monotonic()
+        rendered = escape_dollars(self.text) if self.escape else self.text
+        self.box.markdown(rendered)
+        self.renders += 1
+        self.bytes_sent += len(rendered.encode("utf-8"))
+
+    def finish(self, fallback=None):
+        # 마지막에는 남은 조각을 반드시 그려서 화면과 저장되는 메시지가 같게 한다
+        if not self.text and not self.pending and fallback:
+            self.pending.append(fallback)
+        self.flush()
+        return self.text
@@ -0,0 +1,175 @@
+import re
+from collections import deque
+from functools import lru_cache
+
+import numpy as np
+from langchain.text_splitter import TextSplitter
+
+from utils.embedding_pipeline import get_encoding
+from utils.embeddings import splitter_encoding
+
+RECURSIVE_SEPARATORS = ["\n\n", "\n", " ", ""]
+
+
+@lru_cache(maxsize=None)
+def token_byte_lengths(encoding_name):
+    encoding = get_encoding(encoding_name)
+    lengths = np.zeros(encoding.max_token_value + 1, dtype=np.int64)
+    for token in range(encoding.max_token_value + 1):
+        try:
+            lengths[token] = len(encoding.decode_single_token_bytes(token))
+        except KeyError:
+            pass
+    return lengths
+
+
+def token_char_offsets(text, encoding_name):
+    # decode_with_offsets 와 같은 값을 토큰마다 파이썬 루프를 돌지 않고 구한다.
+    # 두 번째 값은 글자 첫 바이트에서 시작하는 토큰 위치, 즉 조각을 잘라도 되는 토큰 경계다.
+    # 끝에 len(text) 를 붙여 두어 문서 끝도 토큰 경계로 취급한다
+    encoding = get_encoding(encoding_name)
+    tokens = np.array(encoding.encode_ordinary(text), dtype=np.int64)
+    if not len(tokens):
+        end = np.array([len(text)], dtype=np.int64)
+        return end, end
+    byte_starts = np.concatenate(([0], np.cumsum(token_byte_lengths(encoding_name)[tokens])[:-1]))
+    data = np.frombuffer(text.encode("utf-8"), dtype=np.uint8)
+    # 각 바이트가 몇 번째 글자에 속하는지 (UTF-8 연속 바이트는 0b10xxxxxx)
+    leading = (data & 0xC0) != 0x80
+    char_index = np.cumsum(leading) - 1
+    starts = np.append(char_index[byte_starts], len(text))
+    # 연속 바이트에서 시작하는 토큰은 앞 토큰이 그 글자를 걸치고 있다는 뜻이라 경계가 아니다
+    boundaries = np.append(char_index[byte_starts[leading[byte_starts]]], len(text))
+    return starts, boundaries
+
+
+class FastTokenSplitter(TextSplitter):
+    # from_tiktoken_encoder 는 조각마다 다시 인코딩하지만, 여기서는 문서를 한 번만 인코딩하고
+    # 토큰 시작 위치(offset) 배열에서 searchsorted 로 각 조각의 토큰 수를 센다
+    def __init__(
+        self,
+        separators=None,
+        recursive=False,
+        encoding_name=None,
+        keep_separator=None,
+        **kwargs,
+    ):
+        if keep_separator is None:
+            keep_separator = recursive
+        super().__init__(keep_separator=keep_separator, **kwargs)
+        self._recursive = recursive
+        self._separators = separators or (RECURSIVE_SEPARATORS if recursive else ["\n\n"])
+        self._encoding_name = encoding_name or splitter_encoding()
+        self._encoding = get_encoding(self._encoding_name)
+
+    def _token_len(self, text):
+        return len(self._encoding.encode_ordinary(text))
+
+    def _spans(self, text, begin, end, separator):
+        if separator == "":
+            return [(i, i + 1) for i in range(begin, end)]
+        pattern = re.compile(re.escape(separator))
+        spans = []
+        previous = begin
+        for match in pattern.finditer(text, begin, end):
+            spans.append((previous, match.start()))
+            # keep_separator 이면 구분자는 다음 조각의 앞에 붙는다
+            previous = match.start() if self._keep_separator else match.end()
+        spans.append((previous, end))
+        return [(start, stop) for start, stop in spans if stop > start]
+
+    def _lengths(self, text, offsets, spans, separator):
+        if not spans:
+            return []
+        if separator == "":
+            # 글자 단위 조각은 BPE 병합 중간에서 잘리므로 오프셋으로 셀 수 없다. 한 번에 정확히 센다
+            pieces = [text[start:stop] for start, stop in spans]
+            return [len(tokens) for tokens in self._encoding.encode_ordinary_batch(pieces)]
+        starts, boundaries = offsets
+        bounds = np.array(spans, dtype=np.int64)
+        lengths = (
+            np.searchsorted(starts, bounds[:, 1]) - np.searchsorted(starts, bounds[:, 0])
+        ).tolist()
+        # 조각 경계가 토큰 중간에 걸리면 ("\n " 처럼 앞 공백이 합쳐졌거나 멀티바이트 글자를
+        # 토큰이 나눠 가진 경우) 그 조각만 따로 인코딩한다
+        left = np.searchsorted(boundaries, bounds[:, 0])
+        right = np.searchsorted(boundaries, bounds[:, 1])
+        aligned = (boundaries[left] == bounds[:, 0]) & (boundaries[right] == bounds[:, 1])
+        for i in np.flatnonzero(~aligned).tolist():
+            start, stop = spans[i]
+            lengths[i] = self._token_len(text[start:stop])
+        return lengths
+
+    def _join(self, text, pieces, separator):
+        joined = separator.join(text[start:stop] for (start, stop), _ in pieces)
+        if self._strip_whitespace:
+            joined = joined.strip()
+        return joined or None
+
+    def _merge(self, text, spans, lengths, separator):
+        # TextSplitter._merge_splits 와 같은 규칙. 길이는 미리 센 값을 쓴다
+        separator_len = self._token_len(separator)
+        docs = []
+        current = deque()
+        total = 0
+        for span, length in zip(spans, lengths):
+            if total + length + (separator_len if current else 0) > self._chunk_size:
+                if current:
+                    doc = self._join(text, current, separator)
+                    if doc is not None:
+                        docs.append(doc)
+                    while total > self._chunk_overlap or (
+                        total + length + (separator_len if current else 0) > self._chunk_size
+                        and total > 0
+                    ):
+                        total -= current[0][1] + (separator_len if len(current) > 1 else 0)
+                        current.popleft()
+            current.append((span, length))
+            total += length + (separator_len if len(current) > 1 else 0)
+        doc = self._join(text, current, separator)
+        if doc is not None:
+            docs.append(doc)
+        return docs
+
+    def _split_recursive(self, text, offsets, begin, end, separators):
+        separator = separators[-1]
+        remaining = []
+        for i, candidate in enumerate(separators):
+            if candidate == "":
+                separator = candidate
+                break
+            if re.compile(re.escape(candidate)).search(text, begin, end):
+                separator = candidate
+                remaining = separators[i + 1 :]
+                break
+        spans = self._spans(text, begin, end, separator)
+        lengths = self._lengths(text, offsets, spans, separator)
+        joiner = "" if self._keep_separator else separator
+        chunks = []
+        good_spans = []
+        good_lengths = []
+        for span, length in zip(spans, lengths):
+            if length < self._chunk_size:
+                good_spans.append(span)
+                good_lengths.append(length)
+                continue
+            if good_spans:
+                chunks.extend(self._merge(text, good_spans, good_lengths, joiner))
+                good_spans = []
+                good_lengths = []
+            if remaining:
+                chunks.extend(self._split_recursive(text, offsets, span[0], span[1], remaining))
+            else:
+                chunks.append(text[span[0] : span[1]])
+        if good_spans:
+            chunks.extend(self._merge(text, good_spans, good_lengths, joiner))
+        return chunks
+
+    def split_text(self, text):
+        offsets = token_char_offsets(text, self._encoding_name)
+        if self._recursive:
+            return self._split_recursive(text, offsets, 0, len(text), self._separators)
+        separator = self._separators[0]
+        spans = self._spans(text, 0, len(text), separator)
+        joiner = "" if self._keep_separator else separator
+        return self._merge(text, spans, self._lengths(text, offsets, spans, separator), joiner)
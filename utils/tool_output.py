@@ -0,0 +1,107 @@
+import json
+import math
+
+from utils.embedding_pipeline import get_encoding
+
+MAX_TOOL_TOKENS = 600
+STATEMENT_PERIODS = 4
+HISTORY_DAYS = 10
+# 중요한 항목 순서대로. 토큰 예산을 넘으면 뒤에서부터 잘라낸다
+KEY_ROWS = {
+    "income_stmt": [
+        "Total Revenue",
+        "Gross Profit",
+        "Operating Income",
+        "Net Income",
+        "EBITDA",
+        "Diluted EPS",
+        "Cost Of Revenue",
+        "Operating Expense",
+        "Research And Development",
+        "Tax Provision",
+    ],
+    "balance_sheet": [
+        "Total Assets",
+        "Total Liabilities Net Minority Interest",
+        "Stockholders Equity",
+        "Total Debt",
+        "Cash And Cash Equivalents",
+        "Net Debt",
+        "Current Assets",
+        "Current Liabilities",
+        "Working Capital",
+        "Retained Earnings",
+    ],
+}
+
+
+def count_tokens(text):
+    return len(get_encoding().encode_ordinary(text))
+
+
+def format_number(value):
+    if value is None or (isinstance(value, float) and math.isnan(value)):
+        return ""
+    magnitude = abs(value)
+    if magnitude >= 1e9:
+        return f"{value / 1e9:.2f}B"
+    if magnitude >= 1e6:
+        return f"{value / 1e6:.2f}M"
+    if magnitude >= 1e3:
+        return f"{value / 1e3:.1f}K"
+    return f"{value:.2f}"
+
+
+def _statement_lines(df, dataset):
+    rows = [row for row in KEY_ROWS.get(dataset, []) if row in df.index]
+    if not rows:
+        rows = list(df.index)
+    columns = list(df.columns[:STATEMENT_PERIODS])
+    header = ",".join(["Item"] + [str(column)[:10] for column in columns])
+    lines = [
+        ",".join([str(row)] + [format_number(df.at[row, column]) for column in columns])
+        for row in rows
+    ]
+    return [header], lines
+
+
+def _history_lines(df):
+    if df.empty:
+        return ["No price history"], []
+    closes = df["Close"]
+    change = (closes.iloc[-1] / closes.iloc[0] - 1) * 100
+    summary = [
+        f"Period,{str(df.index[0])[:10]} to {str(df.index[-1])[:10]}",
+        f"Close,{closes.iloc[0]:.2f} -> {closes.iloc[-1]:.2f} ({change:+.1f}%)",
+        f"High,{df['High'].max():.2f}",
+        f"Low,{df['Low'].min():.2f}",
+        f"Avg volume,{format_number(df['Volume'].mean())}",
+        "Date,Close,Volume",
+    ]
+    recent = df.tail(HISTORY_DAYS).iloc[::-1]
+    lines = [
+        f"{str(date)[:10]},{row['Close']:.2f},{format_number(row['Volume'])}"
+        for date, row in recent.iterrows()
+    ]
+    return summary, lines
+
+
+def serialize_tool_output(df, dataset, max_tokens=MAX_TOOL_TOKENS):
+    if dataset in KEY_ROWS:
+        header, lines = _statement_lines(df, dataset)
+    else:
+        header, lines = _history_lines(df)
+    output = "\n".join(header + lines)
+    while lines and count_tokens(output) > max_tokens:
+        lines.pop()
+        output = "\n".join(header + lines)
+
+    baseline = json.dumps(df.to_json())
+    baseline_tokens = count_tokens(baseline)
+    output_tokens = count_tokens(output)
+    print(
+        f"{dataset}: {len(baseline)} -> {len(output)} bytes, "
+        f"{baseline_tokens} -> {output_tokens} tokens "
+        f"({baseline_tokens - output_tokens} saved)"
+    )
+    return output
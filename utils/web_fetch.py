@@ -0,0 +1,118 @@
+import asyncio
+import hashlib
+import os
+import time
+
+import httpx
+from bs4 import BeautifulSoup
+
+from utils.embedding_pipeline import get_encoding
+
+CACHE_DIR = "./.cache/pages"
+PAGE_TTL = 60 * 60 * 24
+MAX_CONCURRENCY = 5
+FETCH_TIMEOUT = 15
+MAX_RESPONSE_BYTES = 2 * 1024 * 1024
+MAX_OUTPUT_TOKENS = 3000
+NOISE_TAGS = ["script", "style", "noscript", "nav", "header", "footer", "aside", "form", "svg"]
+
+
+def extract_main_content(html):
+    soup = BeautifulSoup(html, "html.parser")
+    for tag in soup(NOISE_TAGS):
+        tag.decompose()
+    main = soup.find("article") or soup.find("main") or soup.body or soup
+    return " ".join(main.get_text(" ", strip=True).split())
+
+
+def _cache_path(url):
+    return os.path.join(CACHE_DIR, f"{hashlib.sha256(url.encode('utf-8')).hexdigest()}.txt")
+
+
+def _read_cache(url):
+    path = _cache_path(url)
+    if os.path.isfile(path) and time.time() - os.path.getmtime(path) < PAGE_TTL:
+        with open(path, "r", encoding="utf-8") as f:
+            return f.read()
+    return None
+
+
+def _write_cache(url, text):
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    path = _cache_path(url)
+    with open(f"{path}.tmp", "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(f"{path}.tmp", path)
+
+
+async def _download(client, url):
+    # 응답이 아무리 커도 MAX_RESPONSE_BYTES 까지만 읽는다
+    async with client.stream("GET", url) as response:
+        response.raise_for_status()
+        chunks = []
+        size = 0
+        async for chunk in response.aiter_bytes():
+            chunks.append(chunk)
+            size += len(chunk)
+            if size >= MAX_RESPONSE_BYTES:
+                break
+        content = b"".join(chunks)[:MAX_RESPONSE_BYTES]
+        return content.decode(response.encoding or "utf-8", errors="replace")
+
+
+async def _fetch(client, semaphore, url):
+    cached = _read_cache(url)
+    if cached is not None:
+        return cached
+    async with semaphore:
+        # InvalidURL 처럼 HTTPError 가 아닌 오류도 있으므로 URL 하나의 실패가
+        # gather 전체를 깨서 이미 받은 페이지까지 버리지 않도록 모두 잡는다
+        try:
+            html = await asyncio.wait_for(_download(client, url), timeout=FETCH_TIMEOUT)
+        except Exception as e:
+            print(f"Could not fetch {url}: {e!r}")
+            return None
+    try:
+        text = extract_main_content(html)
+    except Exception as e:
+        print(f"Could not read {url}: {e!r}")
+        return None
+    try:
+        _write_cache(url, text)
+    except OSError as e:
+        print(f"Could not cache {url}: {e!r}")
+    return text
+
+
+async def _fetch_all(urls):
+    semaphore = asyncio.Semaphore(MAX_CONCURRENCY)
+    limits = httpx.Limits(max_connections=MAX_CONCURRENCY)
+    async with httpx.AsyncClient(
+        limits=limits, timeout=FETCH_TIMEOUT, follow_redirects=True
+    ) as client:
+        return await asyncio.gather(*[_fetch(client, semaphore, url) for url in urls])
+
+
+def trim_tokens(text, max_tokens):
+    encoding = get_encoding()
+    tokens = encoding.encode_ordinary(text)
+    if len(tokens) <= max_tokens:
+        return text
+    return encoding.decode(tokens[:max_tokens])
+
+
+def fetch_pages(urls, max_tokens=MAX_OUTPUT_TOKENS):
+    if isinstance(urls, str):
+        urls = [urls]
+    urls = list(dict.fromkeys(urls))
+    if not urls:
+        return ""
+    texts = asyncio.run(_fetch_all(urls))
+    budget = max_tokens // len(urls)
+    sections = []
+    for url, text in zip(urls, texts):
+        if text is None:
+            sections.append(f"Source: {url}\nCould not fetch this page.")
+        else:
+            sections.append(f"Source: {url}\n{trim_tokens(text, budget)}")
+    return "\n\n".join(sections)